@@ -0,0 +1,141 @@
+# Autors: Ronalds Turnis
+# Pakešu režīms: uzvednes tiek ierakstītas pakalpojuma sniedzēja formāta JSONL pakešu datnē, un rezultātu JSONL datne tiek ielasīta atbilžu kešatmiņā
+
+import os
+import sys
+import json
+import hashlib
+from response_cache import ResponseCache, response_key
+from providers import MAX_TOKENS
+
+### Parametri
+BATCH_DIR = "batch" # Mape, kurā tiek glabātas pakešu pieprasījumu un rezultātu datnes
+###
+
+# Stabils pieprasījuma identifikators: uzvednes kārtas numurs un uzvednes jaucējvērtības sākums.
+# Satur tikai ASCII simbolus, jo pakalpojuma sniedzēji neatļauj citus simbolus custom_id laukā.
+def custom_id(i, prompt):
+    return f"req-{i:05d}-{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]}"
+
+# Izveido viena pieprasījuma rindu pakalpojuma sniedzēja pakešu formātā
+def batch_request(provider, model_id, reasoning_budget, request_id, prompt):
+    if provider == "anthropic":
+        thinking = {"type": "enabled", "budget_tokens": reasoning_budget} if reasoning_budget else {"type": "disabled"}
+        return {"custom_id": request_id, "params": {
+            "model": model_id, "max_tokens": MAX_TOKENS, "messages": [{"role": "user", "content": prompt}], "thinking": thinking}}
+    if provider == "gemini":
+        return {"key": request_id, "request": {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generation_config": {"thinking_config": {"thinking_budget": reasoning_budget}}}}
+    return {"custom_id": request_id, "method": "POST", "url": "/v1/responses", "body": {"model": model_id, "input": prompt}}
+
+# Iegūst uzvedni no pieprasījuma rindas (izmanto lokālais pakešu pakalpojums)
+def request_prompt(provider, request):
+    if provider == "anthropic":
+        return request["custom_id"], request["params"]["messages"][0]["content"]
+    if provider == "gemini":
+        return request["key"], request["request"]["contents"][0]["parts"][0]["text"]
+    return request["custom_id"], request["body"]["input"]
+
+# Izveido vienas atbildes rindu pakalpojuma sniedzēja rezultātu formātā (izmanto lokālais pakešu pakalpojums)
+def batch_result(provider, request_id, text=None, error=None):
+    if provider == "anthropic":
+        if error is not None:
+            return {"custom_id": request_id, "result": {"type": "errored", "error": {"message": error}}}
+        return {"custom_id": request_id, "result": {"type": "succeeded", "message": {"content": [{"type": "text", "text": text}]}}}
+    if provider == "gemini":
+        if error is not None:
+            return {"key": request_id, "error": {"message": error}}
+        return {"key": request_id, "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]}}
+    if error is not None:
+        return {"custom_id": request_id, "response": None, "error": {"message": error}}
+    body = {"output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}]}
+    return {"custom_id": request_id, "response": {"status_code": 200, "body": body}, "error": None}
+
+# Iegūst (identifikators, atbildes teksts) no rezultātu rindas; neveiksmīgiem pieprasījumiem teksts ir None
+def parse_result(provider, line):
+    if provider == "anthropic":
+        result = line.get("result") or {}
+        if result.get("type") != "succeeded":
+            return line["custom_id"], None
+        # Spriešanas režīmā pirmais satura bloks ir spriešana, tāpēc tiek ņemti tikai teksta bloki
+        return line["custom_id"], "".join(block["text"] for block in result["message"]["content"] if block.get("type") == "text")
+    if provider == "gemini":
+        if line.get("error") or not line.get("response"):
+            return line["key"], None
+        parts = line["response"]["candidates"][0]["content"]["parts"]
+        return line["key"], "".join(part.get("text", "") for part in parts if not part.get("thought")).strip()
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        return line["custom_id"], None
+    return line["custom_id"], "".join(
+        content["text"] for item in response["body"]["output"] if item.get("type") == "message"
+        for content in item["content"] if content.get("type") == "output_text")
+
+# Ieraksta visas uzvednes pakešu pieprasījumu datnē un atgriež tās ceļu
+def render_batch(prompts, provider, model_id, reasoning_budget, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fout:
+        for i, prompt in enumerate(prompts):
+            request = batch_request(provider, model_id, reasoning_budget, custom_id(i, prompt), prompt)
+            fout.write(json.dumps(request, ensure_ascii=False) + "\n")
+    print(f"{len(prompts)} pieprasījumi saglabāti pakešu datnē: {path}")
+    return path
+
+# Ielasa pakešu rezultātus atbilžu kešatmiņā, lai skripts tos apstrādātu atkārtošanas režīmā bez API pieprasījumiem.
+# Atgriež to uzvedņu numurus, kurām atbildes trūkst vai pieprasījums bija neveiksmīgs.
+def ingest_results(prompts, provider, model_id, reasoning_budget, path, cache=None):
+    cache = cache or ResponseCache()
+    by_id = {custom_id(i, prompt): prompt for i, prompt in enumerate(prompts)}
+    received = set()
+    with open(path, "r", encoding="utf-8") as fin:
+        for line in fin:
+            if not line.strip():
+                continue
+            request_id, text = parse_result(provider, json.loads(line))
+            prompt = by_id.get(request_id)
+            if prompt is None:
+                print(f"Rezultāts {request_id} neatbilst nevienai pašreizējai uzvednei, tas tiek izlaists")
+                continue
+            if text is None:
+                continue
+            cache.put(response_key(provider, model_id, reasoning_budget, prompt), provider, model_id, reasoning_budget, prompt, text)
+            received.add(request_id)
+    missing = [i for i, prompt in enumerate(prompts) if custom_id(i, prompt) not in received]
+    print(f"Ielasītas {len(received)} atbildes no {path}, trūkst {len(missing)}")
+    return missing
+
+# Lokāls, datnēs balstīts pakešu pakalpojuma aizstājējs: izpilda pieprasījumu datni ar call_model un ieraksta rezultātu datni
+# pakalpojuma sniedzēja formātā, lai render -> ingest ciklu varētu pārbaudīt bez īsta pakešu API
+def run_local_batch(requests_path, results_path, provider, call_model):
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    with open(requests_path, "r", encoding="utf-8") as fin, open(results_path, "w", encoding="utf-8") as fout:
+        for line in fin:
+            if not line.strip():
+                continue
+            request_id, prompt = request_prompt(provider, json.loads(line))
+            try:
+                result = batch_result(provider, request_id, text=call_model(prompt))
+            except Exception as e:
+                result = batch_result(provider, request_id, error=str(e))
+            fout.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"Lokālās pakešu apstrādes rezultāti saglabāti datnē: {results_path}")
+    return results_path
+
+# Pieprasījumu un rezultātu datņu ceļi konfigurācijai
+def batch_paths(name):
+    return os.path.join(BATCH_DIR, f"{name}_requests.jsonl"), os.path.join(BATCH_DIR, f"{name}_results.jsonl")
+
+if __name__ == '__main__':
+    # Lokālais pakalpojums atbild no atbilžu kešatmiņas: python batch.py <pieprasījumi.jsonl> <rezultāti.jsonl> <pakalpojuma sniedzējs> <modelis> [spriešanas budžets]
+    requests_file, results_file, provider, model_id = sys.argv[1:5]
+    reasoning_budget = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    cache = ResponseCache()
+
+    def cached_model(prompt):
+        response = cache.get(response_key(provider, model_id, reasoning_budget, prompt))
+        if response is None:
+            raise LookupError("Atbilde nav atrodama kešatmiņā")
+        return response
+
+    run_local_batch(requests_file, results_file, provider, cached_model)
@@ -0,0 +1,399 @@
+# Autors: Ronalds Turnis
+# Programma mēra visu noslogoto koda posmu ātrdarbību ar lokāliem attālināto pakalpojumu aizstājējiem un salīdzina rezultātus ar saglabāto bāzes līniju
+
+import os
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Skripta mape tiek pārvietota uz sys.path beigām, lai regex.py neaizēnotu PyPI "regex" pakotni, ko lieto transformers
+sys.path = [path for path in sys.path if os.path.abspath(path or ".") != ROOT] + [ROOT]
+
+### Parametri, kas tiek mainīti atkarībā no vēlamā mērījuma apjoma
+RESULTS_PATH = os.path.join(ROOT, "benchmark_results.json") # Pēdējā mērījuma rezultāti
+BASELINE_PATH = os.path.join(ROOT, "benchmark_baseline.json") # Bāzes līnija, pret kuru tiek meklēta veiktspējas pasliktināšanās
+NOTEBOOK_PATH = os.path.join(ROOT, "special_model", "transformer.ipynb")
+RULES_GLOB = os.path.join(ROOT, "regex_results", "*_rules.tsv")
+GOLD_DIR = os.path.join(ROOT, "special_model", "parveidojumi")
+THRESHOLD = 0.2 # Pieļaujamā relatīvā pasliktināšanās, pirms rezultāts tiek atzīmēts kā regresija
+REPEAT = 3 # Katrs mērījums tiek atkārtots un tiek ņemts labākais laiks, lai mazinātu fona slodzes ietekmi
+SEED = 42
+WORDS = 20000 # Vārdu skaits tekstvienību apstrādes mērījumiem
+BATCH_SIZE = 256 # collate_fn datu porcijas izmērs
+BEAM_LEMMAS = 20 # Lemmu skaits beam search mērījumam
+NUM_BEAMS = 5
+TRAIN_STEPS = 20 # Apmācības soļu skaits ar sintētiskām datu porcijām
+TRAIN_BATCH_SIZE = 64
+VERT_MB = 16 # Ģenerētās .vert datnes izmērs megabaitos
+RULE_WORDS = 200000 # Vārdu skaits, kam tiek piemēroti visi likumi
+VALIDATION_WORDS = 200 # Vārdu skaits validācijai pret lokālo NoSketch serveri
+STUB_LATENCY = 0.01 # Lokālā NoSketch servera atbildes aizkave sekundēs
+METRIC_OBSERVATIONS = 100000 # Histogrammas mērījumu skaits, ieskaitot vērtības virs lielākās robežas
+###
+
+# Notebook šūnas (pēc metadatu id), kurās definēts tekstvienību apstrādātājs, datu kopa, modelis, apmācības cikls un beam search
+NOTEBOOK_CELLS = ("aapNR8jPZokq", "2FjO72U7MchF", "7zAzuo-6aZ5E", "-UeTyPgwMvsL", "kVGcNxIHfsaG")
+
+# Importi un slēdži, ko definīciju šūnas sagaida no notebook pirmās šūnas (bez optuna, peft un sklearn, kas mērījumiem nav vajadzīgi)
+NOTEBOOK_PRELUDE = """
+import os, re, sys, math, copy, time, queue, random, threading, csv
+import numpy as np
+import torch, torch.nn as nn
+import pandas as pd
+from torch.utils.data import Dataset, DataLoader
+from transformers import PreTrainedTokenizer
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+from torch.amp import autocast, GradScaler
+from tqdm import tqdm
+from lexicon import Lexicon
+import metrics
+constrained_decoding = False
+lexicon_penalty = None
+scheduler = None
+"""
+
+LATVIAN_LETTERS = "aābcčdeēfgģhiījkķlļmnņoprsštuūvzž"
+ENDINGS = ("s", "a", "e", "is", "us", "ums", "šana", "t", "īt", "ēt", "ot", "ība", "tājs", "nieks")
+
+BENCHMARKS = []
+
+# Reģistrē mērījumu: funkcija atgriež vērtību mērvienībā {unit}; higher_is_better norāda, kurā virzienā rezultāts uzlabojas
+def benchmark(name, unit, higher_is_better=True):
+    def register(fn):
+        BENCHMARKS.append((name, unit, higher_is_better, fn))
+        return fn
+    return register
+
+# Izpilda funkciju {repeat} reizes un atgriež īsāko izpildes laiku sekundēs
+def best_time(fn, repeat=REPEAT):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# Ģenerē atkārtojamu sintētisku latviešu vārdu sarakstu
+def synthetic_words(n, seed=SEED):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(LATVIAN_LETTERS) for _ in range(rng.randint(3, 10))) + rng.choice(ENDINGS) for _ in range(n)]
+
+_notebook = None
+
+# Izpilda notebook definīciju šūnas atsevišķā vārdu telpā vienreiz. Šūnas tiek izpildītas pagaidu mapē, lai apmācības šūnas
+# izveidotās mapes nepaliktu repozitorijā, un TensorBoard žurnāls netiek rakstīts.
+def notebook():
+    global _notebook
+    if _notebook is None:
+        with open(NOTEBOOK_PATH, "r", encoding="utf-8") as fin:
+            cells = {cell.get("metadata", {}).get("id"): "".join(cell["source"]) for cell in json.load(fin)["cells"]}
+        namespace = {"__name__": "transformer_notebook", "SummaryWriter": lambda *args, **kwargs: None}
+        exec(NOTEBOOK_PRELUDE, namespace)
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                for cell_id in NOTEBOOK_CELLS:
+                    exec(compile(cells[cell_id], f"transformer.ipynb:{cell_id}", "exec"), namespace)
+            finally:
+                os.chdir(cwd)
+        namespace["torch"].manual_seed(SEED)
+        _notebook = namespace
+    return _notebook
+
+@benchmark("tokenizer_encode", "words/s")
+def bench_tokenizer_encode():
+    tokenizer = notebook()["tokenizer"]
+    words = synthetic_words(WORDS)
+    return len(words) / best_time(lambda: [tokenizer.encode(w) for w in words])
+
+@benchmark("tokenizer_decode", "words/s")
+def bench_tokenizer_decode():
+    tokenizer = notebook()["tokenizer"]
+    encoded = [tokenizer.encode(w) for w in synthetic_words(WORDS)]
+    return len(encoded) / best_time(lambda: [tokenizer.decode(ids) for ids in encoded])
+
+@benchmark("tokenizer_batch_encode", "words/s")
+def bench_tokenizer_batch_encode():
+    tokenizer = notebook()["tokenizer"]
+    words = synthetic_words(WORDS)
+    return len(words) / best_time(lambda: tokenizer.batch_encode(words))
+
+@benchmark("tokenizer_batch_decode", "words/s")
+def bench_tokenizer_batch_decode():
+    tokenizer = notebook()["tokenizer"]
+    ids, _ = tokenizer.batch_encode(synthetic_words(WORDS))
+    return len(ids) / best_time(lambda: tokenizer.batch_decode(ids))
+
+@benchmark("collate_fn", "batches/s")
+def bench_collate_fn():
+    nb = notebook()
+    words = synthetic_words(WORDS)
+    dataset = nb["WordPairDataset"](nb["pd"].DataFrame({"Lemma": words, "Word": words[1:] + words[:1]}), nb["tokenizer"])
+    items = [dataset[i] for i in range(len(dataset))]
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items) - BATCH_SIZE + 1, BATCH_SIZE)]
+    collate_fn = nb["collate_fn"]
+    return len(batches) / best_time(lambda: [collate_fn(batch) for batch in batches])
+
+@benchmark("beam_generate_cpu", "ms/lemma", higher_is_better=False)
+def bench_beam_generate():
+    nb = notebook()
+    torch, tokenizer = nb["torch"], nb["tokenizer"]
+    model = nb["CustomTransformerModel"](nb["vocab_size"]).to(torch.device("cpu")).eval()
+    lemmas = synthetic_words(BEAM_LEMMAS)
+    sources = [torch.tensor([tokenizer.encode(lemma)]) for lemma in lemmas]
+    beam_generate = nb["beam_generate"]
+    return 1000 * best_time(lambda: [beam_generate(model, src, num_beams=NUM_BEAMS) for src in sources]) / len(lemmas)
+
+@benchmark("train_model", "steps/s")
+def bench_train_model():
+    nb = notebook()
+    torch = nb["torch"]
+    device = torch.device("cpu")
+    model = nb["CustomTransformerModel"](nb["vocab_size"]).to(device)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    words = synthetic_words(TRAIN_STEPS * TRAIN_BATCH_SIZE)
+    dataset = nb["WordPairDataset"](nb["pd"].DataFrame({"Lemma": words, "Word": words[::-1]}), nb["tokenizer"])
+    # Datu porcijas tiek sagatavotas iepriekš, lai mērījums ietvertu tikai apmācības soļus
+    batches = list(nb["DataLoader"](dataset, batch_size=TRAIN_BATCH_SIZE, collate_fn=nb["collate_fn"]))
+    nb["train_model"](model, batches[:1], optimizer, device) # Iesilšana
+    return len(batches) / best_time(lambda: nb["train_model"](model, batches, optimizer, device), repeat=1)
+
+# Ģenerē .vert datni ar teikumu robežām, struktūras tagiem, pieturzīmēm un derīgām/nederīgām tekstvienību rindām
+def write_vert(path, size_mb=VERT_MB, seed=SEED):
+    rng = random.Random(seed)
+    words = synthetic_words(5000, seed)
+    limit = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as fout:
+        while written < limit:
+            lines = ["<s>"]
+            for _ in range(rng.randint(5, 20)):
+                word = rng.choice(words)
+                if rng.random() < 0.1:
+                    lines.append(",\t,\tzx\t,")
+                elif rng.random() < 0.05:
+                    lines.append(f"{word.upper()}123\t{word}123\txx\t{word}")
+                else:
+                    lines.append(f"{word}\t{word}\tnc\t{word[:-1] or word}")
+            lines.append("</s>")
+            text = "\n".join(lines) + "\n"
+            fout.write(text)
+            written += len(text.encode("utf-8"))
+    return written
+
+@benchmark("process_file", "MB/s")
+def bench_process_file():
+    import korpuss_filtresana
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path, output_csv = os.path.join(tmp, "bench.vert"), os.path.join(tmp, "bench.csv")
+        size = write_vert(input_path)
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            elapsed = best_time(lambda: korpuss_filtresana.process_file(input_path, output_csv))
+    return size / (1024 * 1024) / elapsed
+
+@benchmark("rule_apply", "words/s")
+def bench_rule_apply():
+    from regex_engine import RuleSet, read_rules
+    from rule_scoring import read_gold_pairs
+    rules = [rule for path in sorted(glob.glob(RULES_GLOB)) for _, _, rule in read_rules(path)]
+    rule_set = RuleSet(rules)
+    # Īstās zelta standarta lemmas, papildinātas ar sintētiskiem vārdiem līdz {RULE_WORDS}
+    lemmas = sorted({lemma for pairs in read_gold_pairs(GOLD_DIR).values() for lemma, _ in pairs})
+    words = (lemmas + synthetic_words(max(0, RULE_WORDS - len(lemmas))))[:RULE_WORDS]
+    return len(words) / best_time(lambda: list(rule_set.apply(words)))
+
+# Lokāls NoSketch servera aizstājējs, kas atbild ar vārda garumā balstītu biežumu pēc {latency} sekunžu aizkaves
+class StubNoSketchHandler(BaseHTTPRequestHandler):
+    latency = STUB_LATENCY
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps({"fullsize": len(self.path) % 7}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@contextlib.contextmanager
+def stub_nosketch():
+    import validation
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNoSketchHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    saved = validation.NOSKETCH_URL, validation.RATE_LIMIT, validation.RATE_BURST, validation.OFFLINE_INDEX, validation._cache
+    # Kešatmiņa un bezsaistes indekss tiek atslēgti, un ātruma ierobežojums tiek noņemts, lai mērītu pašu pieprasījumu ceļu.
+    # Kešatmiņa netiek aizvērta, bet pēc mērījuma atjaunota, lai mērījums neizveidotu kešatmiņas datni.
+    validation.NOSKETCH_URL = f"http://127.0.0.1:{server.server_address[1]}/bonito/run.cgi/view"
+    validation.RATE_LIMIT, validation.RATE_BURST = 1e6, 1000
+    validation._cache = False
+    validation.use_offline_index(None)
+    validation.reset_session()
+    try:
+        yield validation
+    finally:
+        validation.NOSKETCH_URL, validation.RATE_LIMIT, validation.RATE_BURST, index, validation._cache = saved
+        validation.use_offline_index(index)
+        validation.reset_session()
+        server.shutdown()
+        server.server_close()
+
+@benchmark("validate_word", "words/s")
+def bench_validate_word():
+    words = synthetic_words(VALIDATION_WORDS // 4)
+    with stub_nosketch() as validation:
+        return len(words) / best_time(lambda: [validation.validate_word(w) for w in words], repeat=1)
+
+@benchmark("validate_words", "words/s")
+def bench_validate_words():
+    words = synthetic_words(VALIDATION_WORDS)
+    with stub_nosketch() as validation:
+        return len(words) / best_time(lambda: validation.validate_words(words), repeat=1)
+
+# Mēra metriku histogrammas ierakstīšanu un kopsavilkumu. Vērtības aptver visus intervālus, arī pārpildes intervālu virs BUCKETS[-1],
+# tāpēc mērījums arī pārbauda, ka snapshot() spēj apkopot pārāk lēnus izsaukumus.
+@benchmark("metrics_observe", "observations/s")
+def bench_metrics_observe():
+    import metrics
+    values = [metrics.BUCKETS[i % len(metrics.BUCKETS)] * 0.75 for i in range(METRIC_OBSERVATIONS)]
+    values[::100] = [metrics.BUCKETS[-1] * 2] * len(values[::100])
+    enabled = metrics.ENABLED
+    metrics.enable()
+    metrics.reset()
+    try:
+        elapsed = best_time(lambda: [metrics.observe("benchmark", v) for v in values])
+        summary = metrics.snapshot()["timers"]["benchmark"]
+        if summary["buckets"].get("inf") != len(values[::100]) * REPEAT:
+            raise AssertionError(f"Pārpildes intervāls netika apkopots: {summary['buckets']}")
+    finally:
+        metrics.reset()
+        metrics.enable(enabled)
+    return len(values) / elapsed
+
+# Salīdzina rezultātus ar bāzes līniju un atgriež regresiju sarakstu
+def find_regressions(results, baseline, threshold=THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if result.get("value") is None:
+            continue
+        if not base or not base.get("value"):
+            result["baseline"] = None
+            continue
+        change = result["value"] / base["value"] - 1
+        if not result["higher_is_better"]:
+            change = -change
+        result["baseline"] = base["value"]
+        result["change"] = round(change, 4)
+        result["regression"] = change < -threshold
+        if result["regression"]:
+            regressions.append(name)
+    return regressions
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as fin:
+        return json.load(fin)
+
+def write_json(path, data):
+    tmp = path + ".partial"
+    with open(tmp, "w", encoding="utf-8") as fout:
+        json.dump(data, fout, ensure_ascii=False, indent=2)
+        fout.write("\n")
+    os.replace(tmp, path)
+
+# Izpilda izvēlētos mērījumus. Mērījums, kuram trūkst atkarību (piemēram, torch), tiek izlaists, nevis pārtrauc visu izpildi.
+def run_benchmarks(names=None):
+    results = {}
+    for name, unit, higher_is_better, fn in BENCHMARKS:
+        if names and name not in names:
+            continue
+        result = {"value": None, "unit": unit, "higher_is_better": higher_is_better}
+        try:
+            result["value"] = round(fn(), 4)
+            print(f"{name}: {result['value']} {unit}", file=sys.stderr)
+        except ImportError as e:
+            result["skipped"] = f"{type(e).__name__}: {e}"
+            print(f"{name}: izlaists - {result['skipped']}", file=sys.stderr)
+        results[name] = result
+    return results
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()}
+    with contextlib.suppress(ImportError):
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    return info
+
+# Atgriež vides parametrus, kas atšķiras no bāzes līnijas vides (tad salīdzinājums ir tikai aptuvens)
+def environment_mismatch(current, recorded):
+    return sorted(key for key in current if key in recorded and current[key] != recorded[key])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ātrdarbības mērījumi")
+    parser.add_argument("names", nargs="*", help="Izpildāmie mērījumi (pēc noklusējuma visi)")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Saglabāt rezultātus kā jauno bāzes līniju")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Neuzskatīt par kļūdu, ja mērījumam nav bāzes līnijas vērtības")
+    parser.add_argument("--list", action="store_true", help="Tikai izdrukāt mērījumu nosaukumus")
+    args = parser.parse_args()
+
+    known = [name for name, _, _, _ in BENCHMARKS]
+    if args.list:
+        print("\n".join(known))
+        sys.exit()
+    for name in args.names:
+        if name not in known:
+            parser.error(f"Nezināms mērījums: {name}")
+
+    results = run_benchmarks(args.names)
+    baseline = load_json(args.baseline)
+    regressions = find_regressions(results, baseline["results"] if baseline else {}, args.threshold)
+    # Mērījumi, kurus nebija ar ko salīdzināt - tie netiek klusi uzskatīti par veiksmīgiem
+    unchecked = [name for name, result in results.items() if result["value"] is not None and result.get("baseline") is None]
+    env = environment()
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": env, "threshold": args.threshold,
+              "baseline": {"path": args.baseline, "timestamp": baseline.get("timestamp"), "environment": baseline.get("environment"),
+                           "environment_mismatch": environment_mismatch(env, baseline.get("environment", {}))}
+                          if baseline else None,
+              "results": results, "regressions": regressions, "unchecked": unchecked}
+    write_json(args.output, report)
+
+    if args.save_baseline:
+        # Jaunā bāzes līnija papildina iepriekšējo, ja tika izpildīta tikai daļa mērījumu
+        merged = dict(baseline["results"]) if baseline else {}
+        merged.update({name: {key: result[key] for key in ("value", "unit", "higher_is_better")}
+                       for name, result in results.items() if result["value"] is not None})
+        write_json(args.baseline, {"timestamp": report["timestamp"], "environment": report["environment"], "results": merged})
+        print(f"Bāzes līnija saglabāta datnē: {args.baseline}", file=sys.stderr)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if baseline is None:
+        print(f"Brīdinājums: bāzes līnijas datne {args.baseline} nav atrasta, regresijas netika pārbaudītas", file=sys.stderr)
+    elif report["baseline"]["environment_mismatch"]:
+        print(f"Brīdinājums: bāzes līnija izveidota citā vidē ({', '.join(report['baseline']['environment_mismatch'])})", file=sys.stderr)
+    if unchecked:
+        print(f"Mērījumi bez bāzes līnijas: {', '.join(unchecked)}", file=sys.stderr)
+    if regressions:
+        print(f"Veiktspējas regresijas: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+    # Trūkstoša bāzes līnija ir atsevišķs izejas kods, lai CI to nevarētu sajaukt ar veiksmīgu salīdzinājumu
+    sys.exit(2 if unchecked and not (args.save_baseline or args.allow_missing_baseline) else 0)
@@ -3,62 +3,21 @@
 
 import os
 import csv
-import urllib.parse
-import requests
-import time
-
-### Parametri, kas tiek mainīti atkarībā no vēlamā mērījuma veida
+import metrics
+from validation import validate_words, cache_stats
+from dispatch import dispatch, provider_for
+from response_cache import cached_call_model
+from batch import render_batch, ingest_results, batch_paths
+from providers import check_model_type, load_call_model, model_id, model_name, reasoning_budget
+
+### Parametri, kas tiek mainīti atkarībā no vēlamā mērījuma veida (vairākām konfigurācijām izmanto experiments.py)
 MODEL_TYPE = "o3-2025-04-16" # Modeļa izvēle: "o3-2025-04-16", "gpt-4.1-2025-04-14", "gemini-2.5-flash" vai "claude-3-7-sonnet"
 REASONING = False # Parametrs, kas norāda, vai tiek izmantota spriešanas spēja. Strādā tikai "gemini-2.5-flash" un "claude-3-7-sonnet"
 ZERO_SHOT = False # Parametrs, kas norāda, vai tiek izpildīts bez-piemēru (True) vai dažu piemēru (False) mācīšanās scenārijs
+REPLAY = False # Ja True, rezultāti tiek atjaunoti tikai no atbilžu kešatmiņas, neveicot API pieprasījumus
+BATCH = None # Pakešu režīms: None - tiešie API izsaukumi, "render" - uzvedņu ierakstīšana pakešu datnē, "ingest" - pakešu rezultātu ielasīšana
 ###
 
-if MODEL_TYPE == "o3-2025-04-16" or MODEL_TYPE == "gpt-4.1-2025-04-14":
-    from openai import OpenAI
-
-    openai_api_key = os.environ.get("OPENAI_API_KEY")
-    if openai_api_key is None:
-        raise ValueError("Lūdzu uzstādiet OPENAI_API_KEY vides mainīgo!")
-    client = OpenAI()
-
-    def call_model(prompt):
-        return client.responses.create(model=MODEL_TYPE, input=prompt).output_text
-
-elif MODEL_TYPE == "gemini-2.5-flash":
-    from google import genai
-
-    gemini_api_key = os.environ.get("GEMINI_API_KEY")
-    if gemini_api_key is None:
-        raise ValueError("Lūdzu uzstādiet GEMINI_API_KEY vides mainīgo!")
-    client = genai.Client(api_key=gemini_api_key)
-    REASONING_TOKENS = 1024 if REASONING else 0
-
-    def call_model(prompt):
-        return client.models.generate_content(
-                model='gemini-2.5-flash-preview-04-17',                                 
-                contents=prompt, 
-                config=genai.types.GenerateContentConfig(thinking_config=genai.types.ThinkingConfig(thinking_budget=REASONING_TOKENS))
-               ).text.strip()
-
-elif MODEL_TYPE == "claude-3-7-sonnet":
-    import anthropic
-
-    anthropic_api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if anthropic_api_key is None:
-        raise ValueError("Lūdzu uzstādiet ANTHROPIC_API_KEY vides mainīgo!")
-    client = anthropic.Anthropic()
-    thinking = { "type": "enabled", "budget_tokens": 1024 } if REASONING else { "type": "disabled" }
-
-    def call_model(prompt):
-        return client.messages.create(
-                model="claude-3-7-sonnet-20250219", 
-                max_tokens=1536, 
-                messages=[{"role": "user", "content": prompt}], 
-                thinking=thinking
-               ).content[1 if REASONING else 0].text
-else:
-    raise ValueError("Nepareizs MODEL_TYPE!")
-
 # Vērtēšanas datu kopa formātā <lemma, lemmu grupas apzīmējums, sākotnējā semantiskā kategorija, mērķa semantiskā kategorija>
 lemmas = [
     ("veikt", "V", "Darīt", "Rezultāts"),
@@ -150,7 +109,7 @@ POSSIBLE_TRANSFORMATIONS = [
 ]
 
 # Uzvednes izveidošana atkarībā no bez-piemēru vai dažu piemēru scenārija
-def prompt(lemma, examples, semantic_category_1, semantic_category_2):
+def prompt(lemma, examples, semantic_category_1, semantic_category_2, zero_shot=ZERO_SHOT):
     FEW_SHOT_PROMPT = f"Tev ir doti atvasinājumu piemēri {examples}. "
     INITIAL_PROMPT = (
         f"Dotā lemma ir '{lemma}' ar semantisko kategoriju '{semantic_category_1}'. " 
@@ -158,13 +117,13 @@ def prompt(lemma, examples, semantic_category_1, semantic_category_2):
         "(locījumi nav jāsniedz) latviešu valodā un īsi paskaidro, kādas morfoloģiskās izmaiņas ir nepieciešamas, lai to panāktu. "
         "Atbildē katrai rindai ir jābūt tikai un vienīgi šādā formātā bez jebkāda cita formatējuma: '<Atvasinājums>, <Paskaidrojums>'."
     )
-    return INITIAL_PROMPT if ZERO_SHOT else FEW_SHOT_PROMPT+INITIAL_PROMPT
+    return INITIAL_PROMPT if zero_shot else FEW_SHOT_PROMPT+INITIAL_PROMPT
 
 def get_examples(semantic_category_1, semantic_category_2):
     # Atlasām tikai tos pārveidojumus, kas sakrīt ar veicamo
     for cat1, cat2, examples in POSSIBLE_TRANSFORMATIONS:
         if cat1 == semantic_category_1 and cat2 == semantic_category_2:
-            return list(examples)
+            return sorted(examples) # Sakārtoti, lai uzvedne (un tās kešatmiņas atslēga) katrā izpildē būtu vienāda
     return []
 
 # Funkcija, kas sadala API atbildi pa rindām, izvadot sarakstu ar pāriem formātā: (kandidāts, paskaidrojums)
@@ -181,79 +140,76 @@ def parse_response_lines(response):
 
     return parsed
 
-# Funkcija, kas validē kandidātu, izmantojot korpusa API
-def validate_word(word):
-    encoded_word = urllib.parse.quote(word)
-    url = ("https://nosketch.korpuss.lv/bonito/run.cgi/view?"
-           "corpname=CommonCrawl&format=json&pagesize=2&fromp=0&attrs=word&"
-           "ctxattrs=word%2Ctag&kwicleftctx=5%23&kwicrightctx=5%23&async=0&"
-           f"q=q[lc%3D%22{encoded_word}%22+|+lemma_lc%3D%22{encoded_word}%22]")
-
-    try:
-        r = requests.get(url, timeout=10)
-        if r.status_code == 200:
-            freq = r.json().get("fullsize", 0)
-            if freq == 0:
-                typ = "F" # nav sastopams
-            elif 1 <= freq <= 5:
-                typ = "M" # maz sastopams - nepieciešama manuāla pārbaude
-            else:
-                typ = "T" # daudz sastopams
-            return typ, freq
-        return "validation_error", None
-    except Exception as e:
-        print(f"Validācijas kļūda vārdam '{word}': {e}")
-        return "validation_error", None
-
-results = []
-
-# Iterē caur katru derivējamo lemmu
-for lemma in lemmas:
-    word = lemma[0]
-    semantic_category_1 = lemma[2]
-    semantic_category_2 = lemma[3]
-    
-    # Izvēlas mērķa semantisko kategoriju un tam atbilstošos piemērus
-    examples = get_examples(semantic_category_1, semantic_category_2)
-
-    # Veic izsaukumu modelim atkarībā no izveidotās uzvednes
-    print(prompt(word, examples, semantic_category_1, semantic_category_2))
-    response = call_model(prompt(word, examples, semantic_category_1, semantic_category_2))
-    print("Rezultāts:")
-    print(response)
-    time.sleep(1)
-
-    # Izveido derīga formāta pārus no atbildēm
-    parsed_list = parse_response_lines(response)
-       
-    # Validē katru kandidātu pret korpusu kolekciju un pievieno rezultātu sarakstam
-    for derived_word, explanation in parsed_list:
-        typ, freq = validate_word(derived_word)
-        results.append({
-            "Lemma": word,
-            "Semantiskā_kat_1": semantic_category_1,
-            "Kandidāts": derived_word,
-            "Semantiskā_kat_2": semantic_category_2,
-            "Paskaidrojums": explanation,
-            "Biežums": freq,
-            "Tips": typ,
-            "Grupa": lemma[1]
-        })
-
-# Saglabā rezultātus TSV failā, kas ir formātā '<metode/modelis_eksperiments>.tsv'
-EXPERIMENT = "zero-shot" if ZERO_SHOT else "few-shot"
-REASON = "reasoning" if REASONING else "non-reasoning"
-MODEL = f"{MODEL_TYPE}_{REASON}" if MODEL_TYPE == "gemini-2.5-flash" or MODEL_TYPE == "claude-3-7-sonnet" else MODEL_TYPE
-output_tsv = f"derivation_results/{MODEL}_{EXPERIMENT}.tsv"
-
-with open(output_tsv, "w", newline="", encoding="utf-8-sig") as tsvfile:
-    writer = csv.writer(tsvfile, delimiter="\t")
-    header = ["Lemma", "Semantiskā_kat_1", "Kandidāts", "Semantiskā_kat_2", "Paskaidrojums", "Biežums", "Tips", "Grupa"]
-    writer.writerow(header)
-    
-    for row in results:
-        out_row = [row["Lemma"], row["Semantiskā_kat_1"], row["Kandidāts"], row["Semantiskā_kat_2"], 
-                   row["Paskaidrojums"], row["Biežums"], row["Tips"], row["Grupa"]]
-        writer.writerow(out_row)
-
-print(f"Rezultāti saglabāti TSV failā: {output_tsv}")
+# Izpilda vienu eksperimenta konfigurāciju un atgriež rezultātu TSV faila ceļu.
+# budget - pēc izvēles kopīgs pieprasījumu budžets (dispatch.SharedBudget), ja vienlaicīgi tiek izpildītas vairākas konfigurācijas.
+def run(model_type=MODEL_TYPE, reasoning=REASONING, zero_shot=ZERO_SHOT, replay=REPLAY, batch=BATCH, budget=None, cache=None, verbose=True):
+    check_model_type(model_type)
+    provider = provider_for(model_type)
+    model, budget_tokens = model_id(model_type), reasoning_budget(model_type, reasoning)
+
+    # Atkārtošanas un pakešu režīmā modelis netiek izsaukts tieši, tāpēc pakalpojuma sniedzēja SDK un API atslēgas nav nepieciešamas
+    call_model = None
+    if not (replay or batch):
+        call_model = load_call_model(model_type, reasoning)
+        if budget is not None:
+            call_model = budget.wrap(call_model, provider)
+
+    # Rezultātu TSV fails, kas ir formātā '<metode/modelis_eksperiments>.tsv'
+    experiment = "zero-shot" if zero_shot else "few-shot"
+    name = f"{model_name(model_type, reasoning)}_{experiment}"
+    output_tsv = f"derivation_results/{name}.tsv"
+
+    # Sagatavo uzvedni katrai lemmai, izvēloties mērķa semantisko kategoriju un tam atbilstošos piemērus
+    prompts = [prompt(lemma[0], get_examples(lemma[2], lemma[3]), lemma[2], lemma[3], zero_shot) for lemma in lemmas]
+
+    # Katra atbilde tiek saglabāta kešatmiņā uzreiz pēc saņemšanas, tāpēc pārtrauktu izpildi var atsākt, atkārtoti nemaksājot par jau saņemtajām atbildēm
+    cached_call = cached_call_model(call_model, provider, model, budget_tokens, cache=cache, replay=replay or batch == "ingest")
+
+    # Pakešu režīms: "render" ieraksta visas uzvednes pakešu datnē un beidz darbu, "ingest" ielasa pakešu rezultātus
+    # atbilžu kešatmiņā, pēc kā tie tiek apstrādāti tāpat kā atkārtošanas režīmā
+    requests_jsonl, results_jsonl = batch_paths(f"derivation_{name}")
+    if batch == "render":
+        return render_batch(prompts, provider, model, budget_tokens, requests_jsonl)
+    if batch == "ingest":
+        missing = ingest_results(prompts, provider, model, budget_tokens, results_jsonl, cache=cached_call.cache)
+        if missing:
+            raise LookupError(f"Pakešu rezultātos trūkst atbilžu uzvednēm: {missing}")
+
+    # Rezultāti tiek rakstīti pagaidu failā, kas pēc veiksmīgas izpildes aizstāj iepriekšējo, tāpēc pārtraukta izpilde to nesabojā
+    partial_tsv = output_tsv + ".partial"
+    with open(partial_tsv, "w", newline="", encoding="utf-8-sig") as tsvfile:
+        writer = csv.writer(tsvfile, delimiter="\t")
+        header = ["Lemma", "Semantiskā_kat_1", "Kandidāts", "Semantiskā_kat_2", "Paskaidrojums", "Biežums", "Tips", "Grupa"]
+        writer.writerow(header)
+
+        # Apstrādā katras lemmas atbildi, tiklīdz tā ir saņemta (uzvedņu secībā), un uzreiz ieraksta tās rezultātus TSV failā
+        def process_response(i, prompt_text, response):
+            lemma = lemmas[i]
+            if verbose:
+                print(prompt_text)
+                print("Rezultāts:")
+                print(response)
+
+            # Izveido derīga formāta pārus no atbildēm
+            parsed_list = parse_response_lines(response)
+
+            # Validē visus kandidātus pret korpusu kolekciju vienlaicīgi
+            validations = validate_words(derived_word for derived_word, _ in parsed_list)
+            for (derived_word, explanation), (typ, freq) in zip(parsed_list, validations):
+                writer.writerow([lemma[0], lemma[2], derived_word, lemma[3], explanation, freq, typ, lemma[1]])
+            tsvfile.flush()
+
+        # Veic izsaukumus modelim vienlaicīgi, ievērojot pakalpojuma sniedzēja ierobežojumus (kešatmiņā esošās atbildes tiek atgrieztas uzreiz)
+        dispatch(prompts, cached_call, provider, on_result=process_response, lookup=cached_call.lookup)
+    os.replace(partial_tsv, output_tsv)
+
+    print(f"Rezultāti saglabāti TSV failā: {output_tsv}")
+    if verbose:
+        print(f"Validācijas kešatmiņa: {cache_stats()}")
+        print(f"Atbilžu kešatmiņa: {cached_call.cache.stats}")
+    return output_tsv
+
+if __name__ == '__main__':
+    output_path = run()
+    # Ar METRICS=1 blakus rezultātiem tiek saglabāts izpildes metriku kopsavilkums (API latentums, tekstvienības, kešatmiņa, validācija)
+    metrics.write_summary(os.path.splitext(output_path)[0] + "_metrics.json", model_type=MODEL_TYPE, reasoning=REASONING, zero_shot=ZERO_SHOT)
@@ -0,0 +1,164 @@
+# Autors: Ronalds Turnis
+# Asinhrons LVM pieprasījumu dispečers, kas izsauc call_model vienlaicīgi, ievērojot katra pakalpojuma sniedzēja ierobežojumus
+
+import time
+import random
+import asyncio
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from validation import TokenBucket
+
+### Parametri, kas tiek mainīti atkarībā no pakalpojuma sniedzēja ierobežojumiem
+PROVIDER_LIMITS = { # Pakalpojuma sniedzējs: (vienlaicīgo pieprasījumu skaits, pieprasījumu skaits sekundē)
+    "openai": (8, 4.0),
+    "gemini": (8, 4.0),
+    "anthropic": (4, 2.0),
+    "local": (16, 1000.0), # Lokāls vai testēšanas pakalpojuma sniedzējs
+}
+MAX_RETRIES = 5 # Atkārtojumu skaits pārejošu kļūdu gadījumā (429, 5xx, savienojuma kļūdas)
+BACKOFF = 1.0 # Sākotnējā gaidīšana sekundēs pirms atkārtojuma, katru reizi dubultojas
+MAX_BACKOFF = 60.0 # Maksimālā gaidīšana sekundēs starp atkārtojumiem
+###
+
+# Nosaka pakalpojuma sniedzēju pēc modeļa veida
+def provider_for(model_type):
+    if model_type in ("o3-2025-04-16", "gpt-4.1-2025-04-14"):
+        return "openai"
+    if model_type == "gemini-2.5-flash":
+        return "gemini"
+    if model_type == "claude-3-7-sonnet":
+        return "anthropic"
+    return "local"
+
+# Mēģina iegūt HTTP statusa kodu no pakalpojuma sniedzēja SDK izņēmuma
+def status_code(error):
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+# Atgriež True, ja kļūda ir pārejoša un pieprasījumu ir vērts atkārtot
+def is_transient(error):
+    code = status_code(error)
+    if code is not None:
+        return code in (408, 409, 429) or code >= 500
+    name = type(error).__name__
+    return isinstance(error, (ConnectionError, TimeoutError)) or any(
+        key in name for key in ("RateLimit", "Timeout", "Connection", "Overloaded", "Unavailable", "InternalServer"))
+
+# Žetonu spaiņa ātruma ierobežotājs asinhroniem pieprasījumiem
+class RateLimiter:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# Dispečers, kas izpilda visas uzvednes vienlaicīgi un atgriež atbildes uzvedņu secībā
+class Dispatcher:
+    def __init__(self, call_model, provider, concurrency=None, rate=None, max_retries=MAX_RETRIES, backoff=BACKOFF, lookup=None):
+        default_concurrency, default_rate = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["local"])
+        self.call_model = call_model
+        self.lookup = lookup # Pēc izvēles: funkcija, kas atgriež jau saglabātu atbildi vai None
+        self.provider = provider
+        self.concurrency = concurrency or default_concurrency
+        self.rate = rate or default_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    # Izsauc modeli vienai uzvednei, atkārtojot pārejošu kļūdu gadījumā ar nejauši izkliedētu gaidīšanu
+    async def _call(self, prompt, semaphore, limiter, executor):
+        loop = asyncio.get_running_loop()
+        if self.lookup is not None:
+            response = await loop.run_in_executor(executor, self.lookup, prompt)
+            if response is not None:
+                return response
+
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await limiter.acquire()
+                try:
+                    return await loop.run_in_executor(executor, self.call_model, prompt)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_transient(e):
+                        metrics.count(f"llm/{self.provider}/errors")
+                        raise
+                    metrics.count(f"llm/{self.provider}/retries")
+                    error = e
+            delay = min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Pārejoša kļūda ({self.provider}): {error}. Atkārto pēc {delay:.1f} s")
+            await asyncio.sleep(delay)
+
+    # Izpilda visas uzvednes; on_result(i, uzvedne, atbilde) tiek izsaukts uzvedņu secībā, tiklīdz atbilde un visas iepriekšējās ir saņemtas
+    async def run(self, prompts, on_result=None):
+        prompts = list(prompts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate)
+        responses = [None] * len(prompts)
+        done = [False] * len(prompts)
+        next_index = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            async def run_one(i):
+                responses[i] = await self._call(prompts[i], semaphore, limiter, executor)
+                return i
+
+            tasks = [asyncio.create_task(run_one(i)) for i in range(len(prompts))]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    done[await finished] = True
+                    while next_index < len(prompts) and done[next_index]:
+                        if on_result is not None:
+                            on_result(next_index, prompts[next_index], responses[next_index])
+                        next_index += 1
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+        return responses
+
+# Procesam kopīgs pieprasījumu budžets vairākiem vienlaicīgiem dispečeriem (piemēram, eksperimentu matricas šūnām).
+# Ierobežo kopējo vienlaicīgo pieprasījumu skaitu un katra pakalpojuma sniedzēja vienlaicīgumu un ātrumu visām šūnām kopā.
+class SharedBudget:
+    def __init__(self, total=None):
+        self.total = threading.BoundedSemaphore(total) if total else None
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def _limits(self, provider):
+        with self._lock:
+            if provider not in self._providers:
+                concurrency, rate = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["local"])
+                self._providers[provider] = (threading.BoundedSemaphore(concurrency), TokenBucket(rate, 1))
+            return self._providers[provider]
+
+    # Ietin call_model tā, ka katrs izsaukums tiek veikts tikai budžeta ietvaros
+    def wrap(self, call_model, provider):
+        semaphore, bucket = self._limits(provider)
+
+        def call(prompt):
+            with self.total or nullcontext(), semaphore:
+                bucket.acquire()
+                return call_model(prompt)
+        return call
+
+# Sinhrona ieeja skriptiem: izpilda visas uzvednes un atgriež atbildes uzvedņu secībā
+def dispatch(prompts, call_model, provider, on_result=None, **kwargs):
+    return asyncio.run(Dispatcher(call_model, provider, **kwargs).run(prompts, on_result))
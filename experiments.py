@@ -0,0 +1,113 @@
+# Autors: Ronalds Turnis
+# Programma izpilda eksperimentu matricu (metodes × modeļi × spriešana × bez-piemēru/dažu piemēru) vienā komandā, izpildot konfigurācijas vienlaicīgi
+
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+from dispatch import SharedBudget
+from response_cache import ResponseCache
+from providers import MODEL_TYPES, REASONING_MODELS, model_name
+
+### Parametri, kas tiek mainīti atkarībā no pieejamajiem API ierobežojumiem
+METHODS = ("derivation", "regex")
+CONCURRENCY = 16 # Kopējais vienlaicīgo API pieprasījumu skaits visām konfigurācijām kopā
+METRICS_PATH = "experiment_metrics.json" # Visas matricas metriku kopsavilkums (tiek saglabāts ar METRICS=1)
+###
+
+# Ielādē metodes skriptu kā moduli ar citu nosaukumu, jo regex.py nosaukums citādi aizēnotu PyPI "regex" pakotni, ko lieto SDK
+def load_method(method):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{method}.py")
+    spec = importlib.util.spec_from_file_location(f"{method}_method", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Izveido visu konfigurāciju sarakstu formātā (metode, modelis, spriešana, bez-piemēru). Spriešana tiek ieslēgta tikai modeļiem,
+# kuriem to var izvēlēties, un regex metodei nav bez-piemēru/dažu piemēru scenārija.
+def build_matrix(methods=METHODS, models=MODEL_TYPES, reasonings=(False, True), shots=(False, True)):
+    cells = []
+    for method in methods:
+        for model_type in models:
+            for reasoning in reasonings:
+                if reasoning and model_type not in REASONING_MODELS:
+                    continue
+                if method == "derivation":
+                    cells.extend((method, model_type, reasoning, zero_shot) for zero_shot in shots)
+                else:
+                    cells.append((method, model_type, reasoning, None))
+    return cells
+
+def cell_name(cell):
+    method, model_type, reasoning, zero_shot = cell
+    name = f"{method}/{model_name(model_type, reasoning)}"
+    return name if zero_shot is None else f"{name}_{'zero-shot' if zero_shot else 'few-shot'}"
+
+# Izpilda visas konfigurācijas vienlaicīgi. Kopējais budžets ierobežo API pieprasījumus visām konfigurācijām kopā,
+# tāpēc kopējais izpildes laiks ir tuvs ilgākās konfigurācijas laikam, nevis visu konfigurāciju laiku summai.
+def run_matrix(cells, concurrency=CONCURRENCY, replay=False, batch=None):
+    modules = {method: load_method(method) for method in {cell[0] for cell in cells}}
+    budget = SharedBudget(concurrency)
+    cache = ResponseCache()
+
+    def run_cell(cell):
+        method, model_type, reasoning, zero_shot = cell
+        kwargs = dict(model_type=model_type, reasoning=reasoning, replay=replay, batch=batch, budget=budget, cache=cache, verbose=False)
+        if zero_shot is not None:
+            kwargs["zero_shot"] = zero_shot
+        start = time.time()
+        try:
+            return cell, modules[method].run(**kwargs), None, time.time() - start
+        except Exception as e:
+            return cell, None, e, time.time() - start
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, len(cells))) as executor:
+        results = list(executor.map(run_cell, cells))
+
+    failed = 0
+    for cell, path, error, elapsed in results:
+        if error is None:
+            print(f"{cell_name(cell)}: {path} ({elapsed:.1f} s)")
+        else:
+            failed += 1
+            print(f"{cell_name(cell)}: kļūda - {type(error).__name__}: {error} ({elapsed:.1f} s)")
+    print(f"Izpildītas {len(cells) - failed}/{len(cells)} konfigurācijas {time.time() - start:.1f} s laikā")
+    print(f"Atbilžu kešatmiņa: {cache.stats}")
+    metrics.write_summary(METRICS_PATH, cells={cell_name(cell): {"seconds": round(elapsed, 3), "ok": error is None}
+                                                for cell, _, error, elapsed in results})
+    return failed
+
+def parse_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Eksperimentu matricas izpilde")
+    parser.add_argument("--methods", type=parse_list, default=list(METHODS), help="derivation,regex")
+    parser.add_argument("--models", type=parse_list, default=list(MODEL_TYPES), help=",".join(MODEL_TYPES))
+    parser.add_argument("--reasoning", choices=["off", "on", "both"], default="both")
+    parser.add_argument("--shots", choices=["few", "zero", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--replay", action="store_true", help="Atjaunot rezultātus tikai no atbilžu kešatmiņas")
+    parser.add_argument("--batch", choices=["render", "ingest"], default=None)
+    parser.add_argument("--list", action="store_true", help="Tikai izdrukāt konfigurācijas")
+    args = parser.parse_args()
+
+    for method in args.methods:
+        if method not in METHODS:
+            parser.error(f"Nezināma metode: {method}")
+    for model_type in args.models:
+        if model_type not in MODEL_TYPES:
+            parser.error(f"Nezināms modelis: {model_type}")
+
+    reasonings = {"off": (False,), "on": (True,), "both": (False, True)}[args.reasoning]
+    shots = {"few": (False,), "zero": (True,), "both": (False, True)}[args.shots]
+    cells = build_matrix(args.methods, args.models, reasonings, shots)
+
+    if args.list:
+        print("\n".join(cell_name(cell) for cell in cells))
+        sys.exit()
+    sys.exit(1 if run_matrix(cells, args.concurrency, args.replay, args.batch) else 0)
@@ -0,0 +1,128 @@
+# Autors: Ronalds Turnis
+# Programma no korpusa vertikālās datnes izveido kompaktu biežumu indeksu, lai kandidātus varētu validēt bez tīkla pieprasījumiem
+
+import sys
+import mmap
+import struct
+from collections import Counter
+from korpuss_filtresana import is_not_token_line
+
+# Indeksa datnes formāts:
+#   MAGIC | N (uint64) | korpusa nosaukuma garums (uint64) | korpusa nosaukums UTF-8 |
+#   N+1 atslēgu nobīdes (uint64) | N vaicājuma biežumi | N vārdformu biežumi | N lemmu biežumi | atslēgas UTF-8
+# Atslēgas ir sakārtotas pēc baitiem, tāpēc meklēšana notiek ar bināro meklēšanu tieši atmiņā kartētajā datnē.
+# Korpusa nosaukums ir tas pats, kas korpusa API parametrā corpname, lai validācija indeksu izmantotu tikai šim korpusam.
+MAGIC = b"LVFIDX2\n"
+HEADER = struct.Struct("<8sQQ")
+UINT64 = struct.Struct("<Q")
+CORPUS = "LVK2022" # Korpuss, no kura vertikālās datnes pēc noklusējuma tiek veidots indekss (validācijai jālieto VALIDATION_CORPUS=LVK2022)
+
+# Saskaita vārdformu un lemmu biežumus (mazajiem burtiem) ievades vertikālajā datnē
+def count_frequencies(input_path):
+    query_counts = Counter() # Tekstvienības, kurām lc = X vai lemma_lc = X (tāpat kā korpusa API vaicājumā)
+    word_counts = Counter()
+    lemma_counts = Counter()
+    with open(input_path, "r", encoding="utf-8") as fin:
+        for line in fin:
+            if not is_not_token_line(line):
+                continue
+            parts = line.split()
+            if len(parts) < 3:
+                continue
+            word = parts[0].lower()
+            lemma = parts[-1].lower()
+            word_counts[word] += 1
+            lemma_counts[lemma] += 1
+            query_counts[word] += 1
+            if lemma != word:
+                query_counts[lemma] += 1 # Viena tekstvienība vaicājumā tiek skaitīta tikai vienreiz
+    return query_counts, word_counts, lemma_counts
+
+# Ieraksta biežumus indeksa datnē
+def write_index(output_path, query_counts, word_counts, lemma_counts, corpname=CORPUS):
+    keys = sorted(k.encode("utf-8") for k in query_counts)
+    name = corpname.encode("utf-8")
+    with open(output_path, "wb") as fout:
+        fout.write(HEADER.pack(MAGIC, len(keys), len(name)))
+        fout.write(name)
+
+        offset = 0
+        offsets = bytearray()
+        for key in keys:
+            offsets += UINT64.pack(offset)
+            offset += len(key)
+        offsets += UINT64.pack(offset)
+        fout.write(offsets)
+
+        for counts in (query_counts, word_counts, lemma_counts):
+            fout.write(b"".join(UINT64.pack(counts.get(key.decode("utf-8"), 0)) for key in keys))
+        fout.write(b"".join(keys))
+
+# Izveido biežumu indeksu no vertikālās datnes
+def build_index(input_path, output_path, corpname=CORPUS):
+    counts = count_frequencies(input_path)
+    write_index(output_path, *counts, corpname=corpname)
+    print(f"Biežumu indekss ({corpname}) ar {len(counts[0])} atslēgām saglabāts datnē: {output_path}")
+
+# Atmiņā kartēts biežumu indekss, kas ielādējas uzreiz, jo datne netiek nolasīta pilnībā
+class FrequencyIndex:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, name_length = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Nederīga vai novecojusi biežumu indeksa datne (jāizveido no jauna): {path}")
+        self.corpname = self._mm[HEADER.size:HEADER.size + name_length].decode("utf-8") # Korpuss, no kura indekss izveidots
+        self._offsets = HEADER.size + name_length
+        self._query = self._offsets + (self.size + 1) * UINT64.size
+        self._words = self._query + self.size * UINT64.size
+        self._lemmas = self._words + self.size * UINT64.size
+        self._keys = self._lemmas + self.size * UINT64.size
+
+    def __len__(self):
+        return self.size
+
+    def _key(self, i):
+        start = UINT64.unpack_from(self._mm, self._offsets + i * UINT64.size)[0]
+        end = UINT64.unpack_from(self._mm, self._offsets + (i + 1) * UINT64.size)[0]
+        return self._mm[self._keys + start:self._keys + end]
+
+    # Atgriež atslēgas pozīciju indeksā vai -1, ja tās nav
+    def _find(self, word):
+        key = word.lower().encode("utf-8")
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.size and self._key(lo) == key:
+            return lo
+        return -1
+
+    def _count(self, base, i):
+        return UINT64.unpack_from(self._mm, base + i * UINT64.size)[0] if i >= 0 else 0
+
+    # Tekstvienību skaits, kurām vārdforma vai lemma sakrīt ar doto vārdu (kā korpusa API "fullsize")
+    def frequency(self, word):
+        return self._count(self._query, self._find(word))
+
+    # Atgriež (vārdformas biežums, lemmas biežums)
+    def counts(self, word):
+        i = self._find(word)
+        return self._count(self._words, i), self._count(self._lemmas, i)
+
+    def __contains__(self, word):
+        return self._find(word) >= 0
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+if __name__ == '__main__':
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "LVK2022-t2.2.1.vert"
+    output_index = sys.argv[2] if len(sys.argv) > 2 else "LVK2022_biezumi.idx"
+    corpname = sys.argv[3] if len(sys.argv) > 3 else CORPUS
+    build_index(input_file, output_index, corpname)
@@ -1,8 +1,20 @@
 # Autors: Ronalds Turnis
 # Programma sagatavo transformera modeļa apmācības datus, filtrējot korpusa datu kopu
 
+import io
+import os
 import csv
 import string
+from collections import Counter, deque
+from multiprocessing import Pool
+
+### Parametri, kas tiek mainīti atkarībā no vēlamā apstrādes veida
+WORKERS = os.cpu_count() or 1 # Paralēlo procesu skaits, 1 - apstrāde vienā procesā
+CHUNK_SIZE = 64 * 1024 * 1024 # Viena procesa apstrādājamā ievades datnes daļa baitos
+DEDUPLICATE = False # Ja True, katrs (vārds, lemma) pāris tiek ierakstīts vienreiz kopā ar tā sastopamības skaitu
+###
+
+PUNCTUATION = frozenset(string.punctuation)
 
 # Atgriež True, ja līnija satur derīgus datus, izņemot XML birkas un tukšas rindas.
 def is_not_token_line(line):
@@ -15,28 +27,92 @@ def is_valid_word(word):
         return False
     if not any(c.isalpha() for c in word):
         return False
-    if all(c in string.punctuation for c in word):
+    if all(c in PUNCTUATION for c in word):
         return False
     return True
 
-# Ja ievades datnes līnija satur vismaz trīs daļas, ņem pirmo un pēdējo lauku kā locījumu vai derivātu un lemmu, un ieraksta tos CSV formāta datnē.
-def process_file(input_path, output_csv):
-    results = []
-    with open(input_path, 'r', encoding='utf-8') as fin:
-        for line in fin:
-            if is_not_token_line(line):
-                parts = line.strip().split()
-                if len(parts) >= 3:
-                    word = parts[0]
-                    lemma = parts[-1]
-                    if word.lower() != lemma.lower() and is_valid_word(word) and is_valid_word(lemma):
-                        results.append((word, lemma))
-
-    # Saglabā rezultātus CSV failā
+# Ja līnija satur vismaz trīs daļas, atgriež pirmo un pēdējo lauku kā locījumu vai derivātu un lemmu, citādi None.
+def filter_line(line):
+    if not is_not_token_line(line):
+        return None
+    parts = line.split()
+    if len(parts) < 3:
+        return None
+    word = parts[0]
+    lemma = parts[-1]
+    if word.lower() != lemma.lower() and is_valid_word(word) and is_valid_word(lemma):
+        return word, lemma
+    return None
+
+# Sadala ievades datni baitu diapazonos, kuru robežas sakrīt ar rindu robežām
+def chunk_ranges(input_path, chunk_size=CHUNK_SIZE):
+    size = os.path.getsize(input_path)
+    ranges = []
+    with open(input_path, "rb") as fin:
+        start = 0
+        while start < size:
+            fin.seek(min(start + chunk_size, size))
+            fin.readline() # Pabeidz iesākto rindu, lai tā netiktu sadalīta starp diviem procesiem
+            end = min(fin.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+# Apstrādā vienu ievades datnes daļu un atgriež derīgos pārus kā gatavas CSV rindas vai pāru skaitus
+def process_chunk(args):
+    input_path, start, end, deduplicate = args
+    if deduplicate:
+        pairs = Counter()
+    else:
+        out = io.StringIO(newline="")
+        writer = csv.writer(out)
+    with open(input_path, "rb") as fin:
+        fin.seek(start)
+        while fin.tell() < end:
+            raw = fin.readline()
+            if not raw:
+                break
+            pair = filter_line(raw.decode("utf-8"))
+            if pair is None:
+                continue
+            if deduplicate:
+                pairs[pair] += 1
+            else:
+                writer.writerow(pair)
+    return pairs if deduplicate else out.getvalue()
+
+# Apstrādā datnes daļas paralēli, atgriežot rezultātus ievades secībā un vienlaicīgi glabājot atmiņā ne vairāk kā 2 * WORKERS daļas
+def iter_chunks(input_path, workers=WORKERS, chunk_size=CHUNK_SIZE, deduplicate=DEDUPLICATE):
+    tasks = [(input_path, start, end, deduplicate) for start, end in chunk_ranges(input_path, chunk_size)]
+    if workers <= 1:
+        for task in tasks:
+            yield process_chunk(task)
+        return
+
+    with Pool(workers) as pool:
+        pending = deque()
+        for task in tasks:
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(process_chunk, (task,)))
+        while pending:
+            yield pending.popleft().get()
+
+# Filtrē ievades datni un ieraksta (vārds, lemma) pārus CSV formāta datnē, rakstot rezultātus pakāpeniski.
+def process_file(input_path, output_csv, workers=WORKERS, chunk_size=CHUNK_SIZE, deduplicate=DEDUPLICATE):
     with open(output_csv, "w", newline="", encoding="utf-8-sig") as csvfile:
         writer = csv.writer(csvfile)
-        writer.writerow(["Word", "Lemma"])
-        writer.writerows(results)
+        if not deduplicate:
+            writer.writerow(["Word", "Lemma"])
+            for rows in iter_chunks(input_path, workers, chunk_size, deduplicate):
+                csvfile.write(rows)
+        else:
+            # Atmiņā tiek glabāti tikai unikālie pāri, saglabājot to pirmās sastopamības secību
+            counts = Counter()
+            for pairs in iter_chunks(input_path, workers, chunk_size, deduplicate):
+                counts.update(pairs)
+            writer.writerow(["Word", "Lemma", "Count"])
+            writer.writerows((word, lemma, count) for (word, lemma), count in counts.items())
     print(f"Datu attīrīšana pabeigta, rezultāts saglabāts CSV failā: {output_csv}")
 
 if __name__ == '__main__':
@@ -0,0 +1,75 @@
+# Autors: Ronalds Turnis
+# Programma no filtrētā korpusa CSV izveido apliecināto vārdformu leksikonu, ko ierobežotā dekodēšanā izmanto kā rakstzīmju prefiksu koku
+
+import sys
+import csv
+import bisect
+
+# Leksikona datne satur unikālas vārdformas un lemmas (mazajiem burtiem) pa vienai rindā, sakārtotas pēc Unikoda koda punktiem.
+# Sakārtotā sarakstā visi vārdi ar vienu prefiksu atrodas blakus, tāpēc prefiksu koka mezgls ir tikai diapazons [lo, hi),
+# un pāreja uz bērnu mezglu ir binārā meklēšana šajā diapazonā. Tas aizņem daudz mazāk atmiņas nekā vārdnīcu koks.
+MAX_CHAR = "\U0010ffff"
+
+# Izveido leksikonu no korpuss_filtresana.py izveidotās (vārds, lemma) CSV datnes
+def build_lexicon(input_csv, output_path):
+    words = set()
+    with open(input_csv, "r", newline="", encoding="utf-8-sig") as fin:
+        reader = csv.reader(fin)
+        next(reader, None) # Galvene
+        for row in reader:
+            for word in row[:2]:
+                words.add(word.lower())
+    with open(output_path, "w", encoding="utf-8") as fout:
+        for word in sorted(words):
+            fout.write(word + "\n")
+    print(f"Leksikons ar {len(words)} vārdiem saglabāts datnē: {output_path}")
+
+class Lexicon:
+    def __init__(self, source):
+        if isinstance(source, str):
+            with open(source, "r", encoding="utf-8") as fin:
+                source = [line.rstrip("\n") for line in fin]
+        self.words = sorted({word.lower() for word in source if word})
+        self.root = (0, len(self.words)) # Tukšā prefiksa diapazons
+        self._children = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        i = bisect.bisect_left(self.words, word.lower())
+        return i < len(self.words) and self.words[i] == word.lower()
+
+    # Atgriež True, ja prefikss ar garumu depth diapazonā span pats ir vārds
+    def is_word(self, span, depth):
+        lo, hi = span
+        return lo < hi and len(self.words[lo]) == depth # Vārds ir mazākais no visiem vārdiem ar šo prefiksu
+
+    # Pāreja no prefiksa ar garumu depth uz prefiksu + ch; atgriež jauno diapazonu vai None, ja tāda prefiksa leksikonā nav
+    def step(self, span, depth, ch):
+        lo, hi = span
+        if lo >= hi:
+            return None
+        prefix = self.words[lo][:depth] + ch
+        start = bisect.bisect_left(self.words, prefix, lo, hi)
+        end = bisect.bisect_right(self.words, prefix + MAX_CHAR, start, hi)
+        return (start, end) if start < end else None
+
+    # Atgriež visas rakstzīmes, ar kurām prefiksu var turpināt, lai tas joprojām būtu kāda vārda sākums
+    def children(self, span, depth):
+        key = (span, depth)
+        if key not in self._children:
+            lo, hi = span
+            chars = []
+            i = lo + 1 if self.is_word(span, depth) else lo
+            while i < hi:
+                prefix = self.words[i][:depth + 1]
+                chars.append(prefix[-1])
+                i = bisect.bisect_right(self.words, prefix + MAX_CHAR, i, hi)
+            self._children[key] = chars
+        return self._children[key]
+
+if __name__ == '__main__':
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "LVK2022_filtrets.csv"
+    output_file = sys.argv[2] if len(sys.argv) > 2 else "LVK2022_leksikons.txt"
+    build_lexicon(input_file, output_file)
@@ -0,0 +1,156 @@
+# Autors: Ronalds Turnis
+# Viegls instrumentācijas slānis: taimeri, skaitītāji un latentuma histogrammas, kas tiek ierakstīti SummaryWriter žurnālā un JSON izpildes kopsavilkumā
+
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import nullcontext
+
+### Parametri
+ENABLED = os.environ.get("METRICS", "") not in ("", "0") # Ja False, visi izsaukumi ir tukšas operācijas (ieslēdz ar METRICS=1 vai enable())
+BUCKETS = tuple(0.0005 * 2 ** i for i in range(20)) # Latentuma histogrammas augšējās robežas sekundēs (0,5 ms .. ~4,4 min)
+###
+
+BUCKET_LABELS = tuple(f"{bound:g}" for bound in BUCKETS) + ("inf",) # Pēdējais - vērtības virs lielākās robežas
+
+# Latentuma histogramma ar fiksētiem logaritmiskiem intervāliem, tāpēc atmiņas patēriņš nav atkarīgs no mērījumu skaita
+class Histogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1) # Pēdējais intervāls - visas vērtības virs lielākās robežas
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    # Aptuvenā kvantile: tā intervāla augšējā robeža, kurā atrodas q-tā vērtība (ne lielāka par maksimālo vērtību)
+    def quantile(self, q):
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count, "total": round(self.total, 6), "mean": round(self.total / self.count, 6),
+            "min": round(self.min, 6), "max": round(self.max, 6),
+            "p50": round(self.quantile(0.5), 6), "p90": round(self.quantile(0.9), 6), "p99": round(self.quantile(0.99), 6),
+            "buckets": {label: n for label, n in zip(BUCKET_LABELS, self.counts) if n},
+        }
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_started = time.time()
+
+# Ieslēdz vai izslēdz metriku vākšanu
+def enable(enabled=True):
+    global ENABLED
+    ENABLED = bool(enabled)
+
+# Notīra visus savāktos mērījumus (piemēram, pirms jaunas izpildes tajā pašā procesā)
+def reset():
+    global _started
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        _started = time.time()
+
+# Palielina skaitītāju (izsaukumi, kešatmiņas trāpījumi, atkārtojumi, tekstvienības u.c.)
+def count(name, n=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+# Saglabā pēdējo vērtību (piemēram, paraugu skaitu sekundē)
+def gauge(name, value):
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+# Pievieno vienu ilguma mērījumu sekundēs histogrammai
+def observe(name, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+_null_timer = nullcontext()
+
+# Mēra with bloka ilgumu; izslēgtā stāvoklī atgriež kopīgu tukšu kontekstu bez laika nolasīšanas
+def timer(name):
+    return _Timer(name) if ENABLED else _null_timer
+
+# Atgriež visu savākto mērījumu kopsavilkumu
+def snapshot():
+    with _lock:
+        return {
+            "elapsed": round(time.time() - _started, 3),
+            "counters": dict(sorted(_counters.items())),
+            "gauges": dict(sorted(_gauges.items())),
+            "timers": {name: histogram.summary() for name, histogram in sorted(_histograms.items())},
+        }
+
+# Ieraksta izpildes kopsavilkumu JSON datnē (ar papildu laukiem, piemēram, konfigurāciju) un atgriež tās ceļu
+def write_summary(path, **extra):
+    if not ENABLED:
+        return None
+    summary = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **extra, **snapshot()}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".partial"
+    with open(tmp, "w", encoding="utf-8") as fout:
+        json.dump(summary, fout, ensure_ascii=False, indent=2)
+        fout.write("\n")
+    os.replace(tmp, path)
+    print(f"Metriku kopsavilkums saglabāts datnē: {path}")
+    return path
+
+# Ieraksta skaitītājus, rādītājus un taimeru vidējo un kvantiļu vērtības (milisekundēs) TensorBoard SummaryWriter žurnālā
+def log_to_writer(writer, step):
+    if not ENABLED or writer is None:
+        return
+    data = snapshot()
+    for name, value in data["counters"].items():
+        writer.add_scalar(f"metrics/{name}", value, step)
+    for name, value in data["gauges"].items():
+        writer.add_scalar(f"metrics/{name}", value, step)
+    for name, summary in data["timers"].items():
+        if summary["count"]:
+            for key in ("mean", "p50", "p90", "p99"):
+                writer.add_scalar(f"metrics/{name}/{key}_ms", summary[key] * 1000, step)
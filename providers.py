@@ -0,0 +1,134 @@
+# Autors: Ronalds Turnis
+# LVM pakalpojumu sniedzēju saskarnes, kas tiek ielādētas tikai tad, kad attiecīgais modelis tiek izmantots
+
+import os
+import threading
+import metrics
+from dispatch import provider_for
+
+### Parametri, kas tiek mainīti atkarībā no izmantotajiem modeļiem
+MODEL_TYPES = ("o3-2025-04-16", "gpt-4.1-2025-04-14", "gemini-2.5-flash", "claude-3-7-sonnet")
+REASONING_MODELS = ("gemini-2.5-flash", "claude-3-7-sonnet") # Modeļi, kuriem spriešanas spēju var ieslēgt un izslēgt
+MODEL_IDS = {"gemini-2.5-flash": "gemini-2.5-flash-preview-04-17", "claude-3-7-sonnet": "claude-3-7-sonnet-20250219"}
+REASONING_TOKENS = 1024 # Spriešanas budžets tekstvienībās
+MAX_TOKENS = 1536 # Anthropic atbildes garuma ierobežojums
+###
+
+_clients = {}
+_lock = threading.Lock()
+
+# Pārbauda, vai modeļa veids ir atbalstīts
+def check_model_type(model_type):
+    if model_type not in MODEL_TYPES:
+        raise ValueError("Nepareizs MODEL_TYPE!")
+
+# Precīzais modeļa identifikators, kas tiek nodots API un izmantots atbilžu kešatmiņas atslēgā
+def model_id(model_type):
+    return MODEL_IDS.get(model_type, model_type)
+
+# Spriešanas budžets tekstvienībās (0, ja spriešana netiek izmantota vai modelim nav pieejama)
+def reasoning_budget(model_type, reasoning):
+    return REASONING_TOKENS if reasoning and model_type in REASONING_MODELS else 0
+
+# Modeļa nosaukums rezultātu datņu nosaukumos
+def model_name(model_type, reasoning):
+    reason = "reasoning" if reasoning else "non-reasoning"
+    return f"{model_type}_{reason}" if model_type in REASONING_MODELS else model_type
+
+# Pārbauda API atslēgu un izveido pakalpojuma sniedzēja klientu pirmajā izsaukumā (SDK tiek importēts tikai tad)
+def get_client(provider):
+    with _lock:
+        if provider in _clients:
+            return _clients[provider]
+
+        if provider == "openai":
+            from openai import OpenAI
+
+            if os.environ.get("OPENAI_API_KEY") is None:
+                raise ValueError("Lūdzu uzstādiet OPENAI_API_KEY vides mainīgo!")
+            client = OpenAI()
+
+        elif provider == "gemini":
+            from google import genai
+
+            gemini_api_key = os.environ.get("GEMINI_API_KEY")
+            if gemini_api_key is None:
+                raise ValueError("Lūdzu uzstādiet GEMINI_API_KEY vides mainīgo!")
+            client = genai.Client(api_key=gemini_api_key)
+
+        elif provider == "anthropic":
+            import anthropic
+
+            if os.environ.get("ANTHROPIC_API_KEY") is None:
+                raise ValueError("Lūdzu uzstādiet ANTHROPIC_API_KEY vides mainīgo!")
+            client = anthropic.Anthropic()
+        else:
+            raise ValueError(f"Nezināms pakalpojuma sniedzējs: {provider}")
+
+        _clients[provider] = client
+        return client
+
+# Pieskaita atbildes tekstvienību patēriņu metrikās (lauku nosaukumi katram pakalpojuma sniedzējam atšķiras)
+def record_usage(provider, response):
+    if not metrics.ENABLED:
+        return
+    if provider == "gemini":
+        usage = getattr(response, "usage_metadata", None)
+        fields = {"input_tokens": "prompt_token_count", "output_tokens": "candidates_token_count", "reasoning_tokens": "thoughts_token_count"}
+    else:
+        usage = getattr(response, "usage", None)
+        fields = {"input_tokens": "input_tokens", "output_tokens": "output_tokens"}
+        if provider == "openai":
+            reasoning = getattr(getattr(usage, "output_tokens_details", None), "reasoning_tokens", None)
+            if isinstance(reasoning, int):
+                metrics.count(f"llm/{provider}/reasoning_tokens", reasoning)
+    for name, attr in fields.items():
+        value = getattr(usage, attr, None)
+        if isinstance(value, int):
+            metrics.count(f"llm/{provider}/{name}", value)
+
+# Atgriež call_model(prompt) funkciju izvēlētajam modelim un spriešanas režīmam
+def load_call_model(model_type, reasoning):
+    check_model_type(model_type)
+    provider = provider_for(model_type)
+    client = get_client(provider)
+    model = model_id(model_type)
+    budget = reasoning_budget(model_type, reasoning)
+
+    latency = f"llm/{provider}/latency"
+
+    if provider == "openai":
+        def call_model(prompt):
+            with metrics.timer(latency):
+                response = client.responses.create(model=model, input=prompt)
+            record_usage(provider, response)
+            return response.output_text
+
+    elif provider == "gemini":
+        from google import genai
+
+        def call_model(prompt):
+            with metrics.timer(latency):
+                response = client.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=genai.types.GenerateContentConfig(thinking_config=genai.types.ThinkingConfig(thinking_budget=budget))
+                       )
+            record_usage(provider, response)
+            return response.text.strip()
+
+    else:
+        thinking = { "type": "enabled", "budget_tokens": budget } if budget else { "type": "disabled" }
+
+        def call_model(prompt):
+            with metrics.timer(latency):
+                response = client.messages.create(
+                        model=model,
+                        max_tokens=MAX_TOKENS,
+                        messages=[{"role": "user", "content": prompt}],
+                        thinking=thinking
+                       )
+            record_usage(provider, response)
+            return response.content[1 if budget else 0].text
+
+    return call_model
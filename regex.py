@@ -3,65 +3,21 @@
 
 import os
 import csv
-import urllib.parse
-import requests
-import re
-import time
-
-### Parametri, kas tiek mainīti atkarībā no vēlamā mērījuma veida
+import metrics
+from validation import validate_words, cache_stats
+from dispatch import dispatch, provider_for
+from response_cache import cached_call_model
+from batch import render_batch, ingest_results, batch_paths
+from regex_engine import RuleSet
+from providers import check_model_type, load_call_model, model_id, model_name, reasoning_budget
+
+### Parametri, kas tiek mainīti atkarībā no vēlamā mērījuma veida (vairākām konfigurācijām izmanto experiments.py)
 MODEL_TYPE = "claude-3-7-sonnet" # Modeļa izvēle: "o3-2025-04-16", "gpt-4.1-2025-04-14", "gemini-2.5-flash" vai "claude-3-7-sonnet"
 REASONING = False # Parametrs, kas norāda, vai tiek izmantota spriešanas spēja. Strādā tikai "gemini-2.5-flash" un "claude-3-7-sonnet"
+REPLAY = False # Ja True, rezultāti tiek atjaunoti tikai no atbilžu kešatmiņas, neveicot API pieprasījumus
+BATCH = None # Pakešu režīms: None - tiešie API izsaukumi, "render" - uzvedņu ierakstīšana pakešu datnē, "ingest" - pakešu rezultātu ielasīšana
 ###
 
-REASON = "reasoning" if REASONING else "non-reasoning"
-MODEL = f"{MODEL_TYPE}_{REASON}" if MODEL_TYPE == "gemini-2.5-flash" or MODEL_TYPE == "claude-3-7-sonnet" else MODEL_TYPE
-
-if MODEL_TYPE == "o3-2025-04-16" or MODEL_TYPE == "gpt-4.1-2025-04-14":
-    from openai import OpenAI
-
-    openai_api_key = os.environ.get("OPENAI_API_KEY")
-    if openai_api_key is None:
-        raise ValueError("Lūdzu uzstādiet OPENAI_API_KEY vides mainīgo!")
-    client = OpenAI()
-
-    def call_model(prompt):
-        return client.responses.create(model=MODEL_TYPE, input=prompt).output_text
-
-elif MODEL_TYPE == "gemini-2.5-flash":
-    from google import genai
-
-    gemini_api_key = os.environ.get("GEMINI_API_KEY")
-    if gemini_api_key is None:
-        raise ValueError("Lūdzu uzstādiet GEMINI_API_KEY vides mainīgo!")
-    client = genai.Client(api_key=gemini_api_key)
-    REASONING_TOKENS = 1024 if REASONING else 0
-
-    def call_model(prompt):
-        return client.models.generate_content(
-                model='gemini-2.5-flash-preview-04-17',                                 
-                contents=prompt, 
-                config=genai.types.GenerateContentConfig(thinking_config=genai.types.ThinkingConfig(thinking_budget=REASONING_TOKENS))
-               ).text.strip()
-
-elif MODEL_TYPE == "claude-3-7-sonnet":
-    import anthropic
-
-    anthropic_api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if anthropic_api_key is None:
-        raise ValueError("Lūdzu uzstādiet ANTHROPIC_API_KEY vides mainīgo!")
-    client = anthropic.Anthropic()
-    thinking = { "type": "enabled", "budget_tokens": 1024 } if REASONING else { "type": "disabled" }
-
-    def call_model(prompt):
-        return client.messages.create(
-                model="claude-3-7-sonnet-20250219", 
-                max_tokens=1536, 
-                messages=[{"role": "user", "content": prompt}], 
-                thinking=thinking
-               ).content[1 if REASONING else 0].text
-else:
-    raise ValueError("Nepareizs MODEL_TYPE!")
-
 # Vērtēšanas datu kopa formātā <lemma, lemmu grupas apzīmējums, sākotnējā semantiskā kategorija, mērķa semantiskā kategorija>
 lemmas = [
     ("veikt", "V", "Darīt", "Rezultāts"),
@@ -152,10 +108,10 @@ POSSIBLE_TRANSFORMATIONS = [
                               ("aizsargāt", "aizsargs")})
 ]
 
-# Uzvednes izveidošana
+# Uzvednes izveidošana (piemēri tiek sakārtoti, lai uzvedne un tās kešatmiņas atslēga katrā izpildē būtu vienāda)
 def prompt(examples, semantic_category_1, semantic_category_2):
     return (
-        f"Doti pāri {examples}, kas veic vārdu atvasināšanu no semantiskās kategorijas {semantic_category_1} "
+        f"Doti pāri {sorted(examples)}, kas veic vārdu atvasināšanu no semantiskās kategorijas {semantic_category_1} "
         f"uz semantisko kategoriju {semantic_category_2}. Iegūsti no šiem pāriem vispārējus latviešu valodas pārveidojumu "
          "likumus un uzraksti pēc iespējas visaptverošākus sed likumus formātā s#^(.*?){vecais}$#\\1{jaunais}#. "
          "Likums drīkst saturēt tieši vienu notveramo grupu (.*?), un aizvietošanas daļā izmanto tikai \\1 + fiksētu sufiksu. " 
@@ -168,50 +124,6 @@ def parse_response_lines(response):
     lines = [line.strip() for line in response.splitlines() if line.strip()]
     return lines
 
-# Funkcija, kas sadala regulāro izteiksmi divās daļās (pattern un replacement)
-def extract_pattern_replacement(rule_str: str):
-    rule_str = rule_str.replace("\x01", r"\1")
-    m = re.match(r'^s#(.*?)#(.*?)#$', rule_str)
-    if not m:
-        return None, None
-    pattern, repl = m.group(1), m.group(2)
-    try:
-        re.compile(pattern)
-    except re.error:
-        return None, None
-    return pattern, repl
-
-# Funkcija, kas, ja tas ir iespējams, piemēro regulāro izteiksmi lemmai un iegūst kandidātu
-def apply_regex_to_lemma(lemma, rule_str):
-    pattern, repl = extract_pattern_replacement(rule_str)
-    if not pattern or not re.search(pattern, lemma):
-        return ""
-    return re.sub(pattern, repl, lemma)
-
-# Funkcija, kas validē kandidātu, izmantojot korpusa API
-def validate_word(word):
-    encoded_word = urllib.parse.quote(word)
-    url = (f"https://nosketch.korpuss.lv/bonito/run.cgi/view?"
-           f"corpname=CommonCrawl&format=json&pagesize=2&fromp=0&attrs=word&"
-           f"ctxattrs=word%2Ctag&kwicleftctx=5%23&kwicrightctx=5%23&async=0&"
-           f"q=q[lc%3D%22{encoded_word}%22+|+lemma_lc%3D%22{encoded_word}%22]")
-
-    try:
-        r = requests.get(url, timeout=10)
-        if r.status_code == 200:
-            freq = r.json().get("fullsize", 0)
-            if freq == 0:
-                typ = "F" # nav sastopams
-            elif 1 <= freq <= 5:
-                typ = "M" # maz sastopams - nepieciešama manuāla pārbaude
-            else:
-                typ = "T" # daudz sastopams
-            return typ, freq
-        return "validation_error", None
-    except Exception as e:
-        print(f"Validācijas kļūda vārdam '{word}': {e}")
-        return "validation_error", None
-
 # Palīgfunkcija pareizam formātam TSV failā
 CTRL = {chr(i) for i in range(32)} | {chr(127)}
 
@@ -224,65 +136,96 @@ def safe_rule(rule: str) -> str:
             out.append(ch)
     return "".join(out)
 
-results = []
-
-# Iterē caur katru pārveidojuma veidu un tā piemēriem
-for semantic_category_1, semantic_category_2, examples in POSSIBLE_TRANSFORMATIONS:
-    # Izsauc modeli ar konkrētā pārveidojuma veida piemēriem
-    print(prompt(examples, semantic_category_1, semantic_category_2))
-    response = call_model(prompt(examples, semantic_category_1, semantic_category_2))
-    print("Atbilde:")
-    print(response)
-    time.sleep(1)
-        
-    # Izveido sarakstu ar derīga formāta regulārajām izteiksmēm
-    rules = parse_response_lines(response)
-
-    # Ieraksta visus ģenerētos likumus failā, kas vēlāk tiek lietoti rezultātiem
-    rules_tsv = f"regex_results/{MODEL}_rules.tsv"
-    with open(rules_tsv, "a", newline="", encoding="utf-8-sig") as f:
-        writer = csv.writer(f, delimiter="\t")
-        for rule in rules:
-            writer.writerow([semantic_category_1, semantic_category_2, safe_rule(rule)])
-
-    # Iterē caur katru vērtēšanas datu kopas elementu
-    for lemma in lemmas:
-        # Iterē caur katru ģenerēto regulāro izteiksmi
-        for rule in rules:
-            # Ja lemmai mērķa semantiskā kategorija nesakrīt ar pārveidojuma veidu, izlaižam to
-            if semantic_category_1 != lemma[2] and semantic_category_2 != lemma[3]:
-                continue
-
-            # Piemēro regulāro izteiksmi
-            derived_word = apply_regex_to_lemma(lemma[0], rule)
-
-            # Ja kandidātu nevar iegūt, turpinām ar nākamo vārdu
-            if not derived_word:
-                continue
-
-            # Kandidāta pārbaude pret korpusu kolekcijas API
-            typ, freq = validate_word(derived_word)
-            
-            # Pievieno rezultātu sarakstam
-            results.append({
-                "Lemma": lemma[0],
-                "Semantiskā_kat_1": lemma[2],
-                "Reg. izteiksme": rule,
-                "Kandidāts": derived_word,
-                "Semantiskā_kat_2": semantic_category_2,
-                "Biežums": freq,
-                "Tips": typ,
-                "Grupa": lemma[1]
-            })
-
-# Saglabā rezultātus TSV failā, kas ir formātā '<metode/modelis>.tsv'
-output_tsv = f"regex_results/{MODEL}.tsv"
-
-with open(output_tsv, "w", newline="", encoding="utf-8-sig") as tsvfile:
-    writer = csv.writer(tsvfile, delimiter="\t")
-    writer.writerow(["Lemma", "Semantiskā_kat_1", "Reg. izteiksme", "Kandidāts", "Semantiskā_kat_2", "Biežums", "Tips", "Grupa"])
-    for row in results:
-        writer.writerow([row["Lemma"], row["Semantiskā_kat_1"], safe_rule(row["Reg. izteiksme"]), row["Kandidāts"],
-                        row["Semantiskā_kat_2"], row["Biežums"], row["Tips"], row["Grupa"]])
-
-print(f"Rezultāti saglabāti TSV failā: {output_tsv}")
+# Izpilda vienu eksperimenta konfigurāciju un atgriež rezultātu TSV faila ceļu.
+# budget - pēc izvēles kopīgs pieprasījumu budžets (dispatch.SharedBudget), ja vienlaicīgi tiek izpildītas vairākas konfigurācijas.
+def run(model_type=MODEL_TYPE, reasoning=REASONING, replay=REPLAY, batch=BATCH, budget=None, cache=None, verbose=True):
+    check_model_type(model_type)
+    provider = provider_for(model_type)
+    model, budget_tokens = model_id(model_type), reasoning_budget(model_type, reasoning)
+    name = model_name(model_type, reasoning)
+
+    # Atkārtošanas un pakešu režīmā modelis netiek izsaukts tieši, tāpēc pakalpojuma sniedzēja SDK un API atslēgas nav nepieciešamas
+    call_model = None
+    if not (replay or batch):
+        call_model = load_call_model(model_type, reasoning)
+        if budget is not None:
+            call_model = budget.wrap(call_model, provider)
+
+    # Izsauc modeli ar katra pārveidojuma veida piemēriem; katra atbilde tiek saglabāta kešatmiņā uzreiz pēc saņemšanas,
+    # tāpēc pārtrauktu izpildi var atsākt, atkārtoti nemaksājot par jau saņemtajām atbildēm
+    prompts = [prompt(examples, semantic_category_1, semantic_category_2) for semantic_category_1, semantic_category_2, examples in POSSIBLE_TRANSFORMATIONS]
+    cached_call = cached_call_model(call_model, provider, model, budget_tokens, cache=cache, replay=replay or batch == "ingest")
+
+    # Pakešu režīms: "render" ieraksta visas uzvednes pakešu datnē un beidz darbu, "ingest" ielasa pakešu rezultātus
+    # atbilžu kešatmiņā, pēc kā tie tiek apstrādāti tāpat kā atkārtošanas režīmā
+    requests_jsonl, results_jsonl = batch_paths(f"regex_{name}")
+    if batch == "render":
+        return render_batch(prompts, provider, model, budget_tokens, requests_jsonl)
+    if batch == "ingest":
+        missing = ingest_results(prompts, provider, model, budget_tokens, results_jsonl, cache=cached_call.cache)
+        if missing:
+            raise LookupError(f"Pakešu rezultātos trūkst atbilžu uzvednēm: {missing}")
+
+    # Likumu fails tiek pārrakstīts katrā izpildē, lai atkārtota izpilde nedublētu likumus; rezultāti ir formātā '<metode/modelis>.tsv'.
+    # Abi faili tiek rakstīti pagaidu failos, kas pēc veiksmīgas izpildes aizstāj iepriekšējos, tāpēc pārtraukta izpilde tos nesabojā.
+    rules_tsv = f"regex_results/{name}_rules.tsv"
+    output_tsv = f"regex_results/{name}.tsv"
+
+    with open(rules_tsv + ".partial", "w", newline="", encoding="utf-8-sig") as rules_file, \
+         open(output_tsv + ".partial", "w", newline="", encoding="utf-8-sig") as tsvfile:
+        rules_writer = csv.writer(rules_file, delimiter="\t")
+        writer = csv.writer(tsvfile, delimiter="\t")
+        writer.writerow(["Lemma", "Semantiskā_kat_1", "Reg. izteiksme", "Kandidāts", "Semantiskā_kat_2", "Biežums", "Tips", "Grupa"])
+
+        # Apstrādā katra pārveidojuma veida atbildi, tiklīdz tā ir saņemta (uzvedņu secībā), un uzreiz ieraksta rezultātus
+        def process_response(i, prompt_text, response):
+            semantic_category_1, semantic_category_2, _ = POSSIBLE_TRANSFORMATIONS[i]
+            if verbose:
+                print(prompt_text)
+                print("Atbilde:")
+                print(response)
+
+            # Izveido sarakstu ar derīga formāta regulārajām izteiksmēm
+            rules = parse_response_lines(response)
+
+            # Ieraksta visus ģenerētos likumus failā, kas vēlāk tiek lietoti rezultātiem
+            for rule in rules:
+                rules_writer.writerow([semantic_category_1, semantic_category_2, safe_rule(rule)])
+
+            # Katrs likums tiek kompilēts vienreiz, un lemmai tiek piemēroti tikai likumi, kuru sufikss ar to sakrīt
+            rule_set = RuleSet(rules)
+
+            # Iterē caur katru vērtēšanas datu kopas elementu
+            transformation_results = []
+            for lemma in lemmas:
+                # Ja lemmai mērķa semantiskā kategorija nesakrīt ar pārveidojuma veidu, izlaižam to
+                if semantic_category_1 != lemma[2] and semantic_category_2 != lemma[3]:
+                    continue
+
+                # Piemēro regulārās izteiksmes, izlaižot tukšus kandidātus
+                for rule, derived_word in rule_set.candidates(lemma[0]):
+                    if derived_word:
+                        transformation_results.append((lemma, rule, derived_word))
+
+            # Visu pārveidojuma kandidātu pārbaude pret korpusu kolekcijas API vienlaicīgi
+            validations = validate_words(derived_word for _, _, derived_word in transformation_results)
+            for (lemma, rule, derived_word), (typ, freq) in zip(transformation_results, validations):
+                writer.writerow([lemma[0], lemma[2], safe_rule(rule), derived_word, semantic_category_2, freq, typ, lemma[1]])
+            rules_file.flush()
+            tsvfile.flush()
+
+        # Kešatmiņā esošās atbildes tiek atgrieztas uzreiz, negaidot pakalpojuma sniedzēja ātruma ierobežojumu
+        dispatch(prompts, cached_call, provider, on_result=process_response, lookup=cached_call.lookup)
+    os.replace(rules_tsv + ".partial", rules_tsv)
+    os.replace(output_tsv + ".partial", output_tsv)
+
+    print(f"Rezultāti saglabāti TSV failā: {output_tsv}")
+    if verbose:
+        print(f"Validācijas kešatmiņa: {cache_stats()}")
+        print(f"Atbilžu kešatmiņa: {cached_call.cache.stats}")
+    return output_tsv
+
+if __name__ == '__main__':
+    output_path = run()
+    # Ar METRICS=1 blakus rezultātiem tiek saglabāts izpildes metriku kopsavilkums (API latentums, tekstvienības, kešatmiņa, validācija)
+    metrics.write_summary(os.path.splitext(output_path)[0] + "_metrics.json", model_type=MODEL_TYPE, reasoning=REASONING)
@@ -0,0 +1,145 @@
+# Autors: Ronalds Turnis
+# Regulāro izteiksmju likumu dzinējs, kas katru sed likumu kompilē vienreiz un vārdam piemēro tikai tos likumus, kuru sufikss ar to sakrīt
+
+import re
+import sys
+import csv
+
+RULE = re.compile(r"^s#(.*?)#(.*?)#$")
+
+# Likums formātā ^(.*?<a>)<b>$ vai ^(.*?<a>)(<b>)$ (arī ar alkatīgo (.*)), kur <a> un <b> ir burtiski simboli bez regulāro izteiksmju metasimboliem.
+# Tā kā izteiksme ir noenkurota abos galos, alkatīgā un nealkatīgā versija sakrīt ar vienu un to pašu sufiksu <a><b>.
+LITERAL = r"[^\\\[\](){}.*+?|^$]*"
+SUFFIX_PATTERN = re.compile(rf"^\^\(\.\*\??({LITERAL})\)(?:\(({LITERAL})\)|({LITERAL}))\$$")
+LITERAL_REPL = re.compile(r"^([^\\]*)\\1([^\\]*)$") # Aizvietojums formātā <prefikss>\1<sufikss>
+
+# Funkcija, kas sadala sed likumu divās daļās (pattern un replacement), atgriežot None, ja likums nav derīgs
+def parse_rule(rule_str):
+    rule_str = rule_str.replace("\\x01", r"\1").replace("\x01", r"\1") # Arī safe_rule aizstātais SOH simbols
+    m = RULE.match(rule_str)
+    if not m:
+        return None
+    return m.group(1), m.group(2)
+
+# Viens kompilēts likums. Ja likumam ir burtisks sufikss, tas tiek piemērots ar virkņu operācijām bez regulārās izteiksmes izpildes.
+class Rule:
+    __slots__ = ("text", "index", "pattern", "repl", "compiled", "suffix", "kept", "prefix", "ending")
+
+    def __init__(self, text, index, pattern, repl):
+        self.text = text
+        self.index = index # Likuma pozīcija ievades sarakstā (ieskaitot nederīgos likumus)
+        self.pattern = pattern
+        self.repl = repl
+        self.compiled = re.compile(pattern)
+        self.suffix = None # Burtiskais sufikss, ar kuru vārdam jābeidzas, vai None, ja likums nav šādā formā
+        self.prefix = self.ending = None # Aizvietojuma daļas pirms un pēc \1, ja aizvietojums ir burtisks
+
+        m = SUFFIX_PATTERN.match(pattern)
+        if m:
+            kept, grouped, plain = m.group(1), m.group(2), m.group(3)
+            self.suffix = kept + (grouped if grouped is not None else plain)
+            self.kept = kept # Sufiksa daļa, kas ietilpst pirmajā notveramajā grupā
+            r = LITERAL_REPL.match(repl)
+            if r:
+                self.prefix, self.ending = r.group(1), r.group(2)
+
+    # Piemēro likumu vārdam, atgriežot kandidātu vai None, ja likums vārdam neder
+    def apply(self, word):
+        if self.prefix is not None:
+            if not word.endswith(self.suffix):
+                return None
+            return self.prefix + word[:len(word) - len(self.suffix)] + self.kept + self.ending
+        if not self.compiled.search(word):
+            return None
+        return self.compiled.sub(self.repl, word)
+
+# Likumu kopa, kurā likumi ar burtisku sufiksu ir indeksēti apgrieztā sufiksu prefiksu kokā (trie).
+# Vārds tiek pārbaudīts tikai pret likumiem, kuru sufikss ir vārda beigās, un pret nedaudzajiem likumiem bez burtiska sufiksa.
+class RuleSet:
+    def __init__(self, rules):
+        self.rules = []
+        self.invalid = [] # Likumi, kurus nevar izparsēt vai kompilēt
+        self._trie = {}
+        self._fallback = []
+
+        for position, text in enumerate(rules):
+            parsed = parse_rule(text)
+            try:
+                rule = Rule(text, position, *parsed) if parsed else None
+            except re.error:
+                rule = None
+            if rule is None:
+                self.invalid.append(text)
+                continue
+            self.rules.append(rule)
+
+            if rule.suffix is None:
+                self._fallback.append(rule)
+                continue
+            node = self._trie
+            for ch in reversed(rule.suffix):
+                node = node.setdefault(ch, {})
+            node.setdefault("", []).append(rule) # Tukšā atslēga glabā likumus, kuru sufikss beidzas šajā mezglā
+
+    def __len__(self):
+        return len(self.rules)
+
+    # Atgriež likumus, kuri var derēt vārdam, to sākotnējā secībā
+    def matching_rules(self, word):
+        node = self._trie
+        found = list(node.get("", ()))
+        for ch in reversed(word):
+            node = node.get(ch)
+            if node is None:
+                break
+            found.extend(node.get("", ()))
+        found.extend(self._fallback)
+        if len(found) > 1:
+            found.sort(key=lambda rule: rule.index)
+        return found
+
+    # Atgriež sarakstu ar (likums, kandidāts) pāriem vienam vārdam
+    def candidates(self, word):
+        result = []
+        for rule in self.matching_rules(word):
+            candidate = rule.apply(word)
+            if candidate is not None:
+                result.append((rule.text, candidate))
+        return result
+
+    # Piemēro likumu kopu visiem vārdiem, atgriežot (vārds, likums, kandidāts) trīskāršus vārdu un likumu secībā
+    def apply(self, words):
+        for word in words:
+            for rule_text, candidate in self.candidates(word):
+                yield word, rule_text, candidate
+
+# Nolasa ģenerēto likumu TSV datni, atgriežot sarakstu ar (semantiskā kategorija 1, semantiskā kategorija 2, likums).
+# Katra rinda tiek atkodēta atsevišķi, jo vecākās datnes ir cp1257 kodējumā ar galveni, bet tām pievienotās rindas ir UTF-8.
+def read_rules(path):
+    rows = []
+    with open(path, "rb") as fin:
+        for raw in fin.read().splitlines():
+            try:
+                line = raw.decode("utf-8").lstrip("\ufeff")
+            except UnicodeDecodeError:
+                line = raw.decode("cp1257", errors="replace")
+            parts = line.split("\t")
+            if len(parts) < 3 or not parts[2].startswith("s#"):
+                continue # Galvene un tukšās rindas
+            rows.append((parts[0], parts[1], parts[2]))
+    return rows
+
+if __name__ == '__main__':
+    # Piemēro likumu datni vārdu sarakstam (viens vārds rindā vai CSV pirmā kolonna): python regex_engine.py <likumi.tsv> <vārdi> [rezultāti.tsv]
+    rules_file, words_file = sys.argv[1], sys.argv[2]
+    output_file = sys.argv[3] if len(sys.argv) > 3 else "regex_engine_results.tsv"
+
+    rule_set = RuleSet(rule for _, _, rule in read_rules(rules_file))
+    with open(words_file, "r", encoding="utf-8-sig") as fin:
+        words = list(dict.fromkeys(line.split(",")[0].split(";")[0].strip() for line in fin if line.strip()))
+
+    with open(output_file, "w", newline="", encoding="utf-8-sig") as tsvfile:
+        writer = csv.writer(tsvfile, delimiter="\t")
+        writer.writerow(["Vārds", "Reg. izteiksme", "Kandidāts"])
+        writer.writerows(rule_set.apply(words))
+    print(f"{len(rule_set)} likumi ({len(rule_set.invalid)} nederīgi) piemēroti {len(words)} vārdiem, rezultāti saglabāti TSV failā: {output_file}")
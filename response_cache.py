@@ -0,0 +1,81 @@
+# Autors: Ronalds Turnis
+# Pastāvīga LVM atbilžu kešatmiņa, kur atslēga ir (pakalpojuma sniedzējs, modelis, spriešanas budžets, uzvedne) jaucējvērtība
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import metrics
+
+CACHE_PATH = os.environ.get("RESPONSE_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.sqlite"))
+
+# Aprēķina atbildes atslēgu no visiem parametriem, kas ietekmē modeļa atbildi
+def response_key(provider, model_id, reasoning_budget, prompt):
+    payload = json.dumps([provider, model_id, reasoning_budget, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, provider TEXT NOT NULL, model_id TEXT NOT NULL, reasoning_budget INTEGER NOT NULL, "
+            "prompt TEXT NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    # Atgriež saglabāto atbildi vai None (count=False - netrāpījums netiek skaitīts statistikā)
+    def get(self, key, count=True):
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row or count:
+                self.stats["hits" if row else "misses"] += 1
+            return row[0] if row else None
+
+    # Saglabā atbildi uzreiz pēc tās saņemšanas, lai tā netiktu zaudēta, ja izpilde tiek pārtraukta
+    def put(self, key, provider, model_id, reasoning_budget, prompt, response):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model_id, reasoning_budget, prompt, response, time.time())
+            )
+            self._conn.commit()
+            self.stats["stores"] += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Ietin call_model tā, ka katra atbilde vispirms tiek meklēta kešatmiņā un jaunās atbildes tiek saglabātas.
+# Atkārtošanas režīmā (replay=True) modelis netiek izsaukts nekad, un trūkstoša atbilde ir kļūda.
+def cached_call_model(call_model, provider, model_id, reasoning_budget, cache=None, replay=False):
+    cache = cache or ResponseCache()
+
+    def call(prompt):
+        key = response_key(provider, model_id, reasoning_budget, prompt)
+        response = cache.get(key)
+        metrics.count("llm/cache_hits" if response is not None else "llm/cache_misses")
+        if response is not None:
+            return response
+        if replay or call_model is None:
+            raise LookupError(f"Atbilde nav atrodama kešatmiņā ({provider}, {model_id}, {reasoning_budget}): {prompt[:80]}...")
+        response = call_model(prompt)
+        cache.put(key, provider, model_id, reasoning_budget, prompt, response)
+        return response
+
+    # Dispečeram ļauj atgriezt jau saglabātās atbildes, negaidot pakalpojuma sniedzēja ātruma ierobežojumu
+    def lookup(prompt):
+        response = cache.get(response_key(provider, model_id, reasoning_budget, prompt), count=False)
+        if response is not None:
+            metrics.count("llm/cache_hits")
+        return response
+
+    call.cache = cache
+    call.lookup = lookup
+    return call
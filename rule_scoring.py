@@ -0,0 +1,171 @@
+# Autors: Ronalds Turnis
+# Programma bez tīkla pieprasījumiem novērtē LVM ģenerētos likumus, piemērojot tos visām korpusa lemmām un salīdzinot ar apliecinātajiem pāriem
+
+import os
+import sys
+import csv
+import glob
+from collections import Counter
+from multiprocessing import Pool
+from regex_engine import RuleSet, read_rules
+
+### Parametri, kas tiek mainīti atkarībā no vēlamā novērtējuma
+CORPUS_CSV = "LVK2022_filtrets.csv" # korpuss_filtresana.py izveidotie (vārds, lemma) pāri
+GOLD_DIR = os.path.join("special_model", "parveidojumi") # Zelta standarta (lemma, atvasinājums) pāri
+RULES_GLOB = os.path.join("regex_results", "*_rules.tsv")
+OUTPUT_TSV = os.path.join("regex_results", "rule_scores.tsv")
+WORKERS = os.cpu_count() or 1 # Paralēlo procesu skaits, 1 - apstrāde vienā procesā
+CHUNK_SIZE = 20000 # Viena uzdevuma lemmu skaits
+###
+
+# Zelta standarta datņu parveidojums_N.csv semantiskās kategorijas (tādā pašā secībā kā POSSIBLE_TRANSFORMATIONS)
+GOLD_CATEGORIES = [
+    ("Darīt", "Darbība"),
+    ("Darīt", "Rezultāts"),
+    ("Darīt", "Darītājs (dzīvs)"),
+    ("Priekšmets", "Ietver nosaukto"),
+    ("Būt procesā", "Process"),
+    ("Būt stāvoklī", "Stāvoklis"),
+    ("Abstrakts nojēgums", "Saistīts ar nosaukto"),
+    ("Darīt", "Vieta (lietvārds)"),
+    ("Darīt", "Cits"),
+    ("Darīt", "Instruments"),
+]
+
+# Nolasa korpusa (vārds, lemma) pārus, atgriežot apliecināto (lemma, vārds) pāru kopu un vārdu krājumu (mazajiem burtiem)
+def read_corpus_pairs(path):
+    pairs, vocabulary = set(), set()
+    with open(path, "r", newline="", encoding="utf-8-sig") as fin:
+        reader = csv.reader(fin)
+        next(reader, None) # Galvene
+        for row in reader:
+            if len(row) < 2:
+                continue
+            word, lemma = row[0].lower(), row[1].lower()
+            pairs.add((lemma, word))
+            vocabulary.add(word)
+            vocabulary.add(lemma)
+    return pairs, vocabulary
+
+# Nolasa zelta standarta pārus, atgriežot vārdnīcu {(semantiskā kategorija 1, semantiskā kategorija 2): {(lemma, atvasinājums)}}
+def read_gold_pairs(gold_dir):
+    gold = {}
+    for n, categories in enumerate(GOLD_CATEGORIES, start=1):
+        path = os.path.join(gold_dir, f"parveidojums_{n}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", newline="", encoding="utf-8-sig") as fin:
+            reader = csv.reader(fin, delimiter=";")
+            next(reader, None) # Galvene
+            gold[categories] = {(row[0].lower(), row[1].lower()) for row in reader if len(row) >= 2}
+    return gold
+
+# Procesu kopīgie dati, kas tiek iestatīti vienreiz katrā procesā
+_rule_sets = None
+_pairs = None
+_vocabulary = None
+
+def init_worker(rule_lists, pairs, vocabulary):
+    global _rule_sets, _pairs, _vocabulary
+    _rule_sets = [(RuleSet(rules), len(rules)) for rules in rule_lists]
+    _pairs = pairs
+    _vocabulary = vocabulary
+
+# Piemēro visas likumu kopas lemmu daļai un katram likumam saskaita:
+# pārklājumu (lemmas, kurām likums dod kandidātu), kandidātus korpusa vārdu krājumā, apliecinātos (lemma, kandidāts) pārus
+# un kolīzijas (kandidāts, ko tai pašai lemmai dod arī kāds cits tās pašas kopas likums)
+def score_chunk(lemmas):
+    results = []
+    for rule_set, size in _rule_sets:
+        coverage, attested, pair_hits, collisions = [0] * size, [0] * size, [0] * size, [0] * size
+        for lemma in lemmas:
+            outputs = []
+            for rule in rule_set.matching_rules(lemma):
+                candidate = rule.apply(lemma)
+                if candidate:
+                    outputs.append((rule.index, candidate))
+            if not outputs:
+                continue
+            counts = Counter(candidate for _, candidate in outputs)
+            for i, candidate in outputs:
+                coverage[i] += 1
+                attested[i] += candidate in _vocabulary
+                pair_hits[i] += (lemma, candidate) in _pairs
+                collisions[i] += counts[candidate] > 1
+        results.append((coverage, attested, pair_hits, collisions))
+    return results
+
+# Saskaita visu lemmu rezultātus paralēli, katram procesam apstrādājot {chunk_size} lemmas vienā uzdevumā
+def score_lemmas(rule_lists, lemmas, pairs, vocabulary, workers=WORKERS, chunk_size=CHUNK_SIZE):
+    totals = [[[0] * len(rules) for _ in range(4)] for rules in rule_lists]
+    chunks = [lemmas[i:i + chunk_size] for i in range(0, len(lemmas), chunk_size)]
+
+    def add(results):
+        for total, counts in zip(totals, results):
+            for column, values in zip(total, counts):
+                for i, value in enumerate(values):
+                    column[i] += value
+
+    if workers <= 1:
+        init_worker(rule_lists, pairs, vocabulary)
+        for chunk in chunks:
+            add(score_chunk(chunk))
+    else:
+        # Lielās kopas tiek nodotas procesiem, tos izveidojot, nevis katram uzdevumam atsevišķi
+        with Pool(workers, initializer=init_worker, initargs=(rule_lists, pairs, vocabulary)) as pool:
+            for results in pool.imap_unordered(score_chunk, chunks):
+                add(results)
+    return totals
+
+def ratio(a, b):
+    return round(a / b, 4) if b else ""
+
+# Novērtē visas likumu datnes un ieraksta kopsavilkumu TSV failā, kur katrs likums ir rinda un katrs rādītājs ir kolonna
+def score_rules(rules_files, corpus_csv=CORPUS_CSV, gold_dir=GOLD_DIR, output_tsv=OUTPUT_TSV, workers=WORKERS):
+    gold = read_gold_pairs(gold_dir)
+    if os.path.exists(corpus_csv):
+        pairs, vocabulary = read_corpus_pairs(corpus_csv)
+    else:
+        print(f"Korpusa datne {corpus_csv} nav atrasta, tiek izmantoti tikai zelta standarta pāri")
+        pairs, vocabulary = set(), set()
+    for gold_pairs in gold.values():
+        pairs |= gold_pairs
+        vocabulary.update(word for pair in gold_pairs for word in pair)
+
+    # Likumi tiek piemēroti katrai apliecinātajai lemmai vienreiz
+    lemmas = sorted({lemma for lemma, _ in pairs})
+    rows = [read_rules(path) for path in rules_files]
+    rule_lists = [[rule for _, _, rule in file_rows] for file_rows in rows]
+    print(f"{sum(map(len, rule_lists))} likumi no {len(rules_files)} datnēm tiek piemēroti {len(lemmas)} lemmām")
+
+    totals = score_lemmas(rule_lists, lemmas, pairs, vocabulary, workers)
+
+    summary = []
+    for path, file_rows, rules, (coverage, attested, pair_hits, collisions) in zip(rules_files, rows, rule_lists, totals):
+        rule_set = RuleSet(rules)
+        by_index = {rule.index: rule for rule in rule_set.rules}
+        for i, (semantic_category_1, semantic_category_2, rule_text) in enumerate(file_rows):
+            # Zelta standarta pārklājums tiek mērīts tikai likuma paša pārveidojuma veidam
+            gold_pairs = gold.get((semantic_category_1, semantic_category_2), set())
+            rule = by_index.get(i)
+            gold_hits = sum(rule.apply(lemma) == word for lemma, word in gold_pairs) if rule else 0
+            summary.append([
+                os.path.basename(path), semantic_category_1, semantic_category_2, rule_text,
+                coverage[i], attested[i], ratio(attested[i], coverage[i]), pair_hits[i], ratio(pair_hits[i], coverage[i]),
+                gold_hits, len(gold_pairs), ratio(gold_hits, len(gold_pairs)), collisions[i], "" if rule else "Nederīgs"
+            ])
+
+    # Katras datnes likumi tiek sakārtoti pēc precizitātes un pārklājuma, lai vājākos likumus varētu atmest
+    summary.sort(key=lambda row: (row[0], -(row[8] or 0), -(row[6] or 0), -row[4]))
+    with open(output_tsv, "w", newline="", encoding="utf-8-sig") as tsvfile:
+        writer = csv.writer(tsvfile, delimiter="\t")
+        writer.writerow(["Likumu_datne", "Semantiskā_kat_1", "Semantiskā_kat_2", "Reg. izteiksme",
+                         "Pārklājums", "Korpusā", "Precizitāte", "Apliecināti_pāri", "Pāru_precizitāte",
+                         "Zelta_trāpījumi", "Zelta_pāri", "Zelta_pārklājums", "Kolīzijas", "Piezīme"])
+        writer.writerows(summary)
+    print(f"Likumu novērtējums saglabāts TSV failā: {output_tsv}")
+    return summary
+
+if __name__ == '__main__':
+    rules_files = sys.argv[1:] or sorted(glob.glob(RULES_GLOB))
+    score_rules(rules_files)
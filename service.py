@@ -0,0 +1,377 @@
+# Autors: Ronalds Turnis
+# Programma darbina lokālu specializētā modeļa HTTP servisu, kas vienlaicīgus pieprasījumus apvieno kopīgos beam search izsaukumos, un slodzes ģeneratoru tā caurlaidības mērīšanai
+
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import signal
+import argparse
+import threading
+import http.client
+from collections import deque
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Skripta mape tiek pārvietota uz sys.path beigām, lai regex.py neaizēnotu PyPI "regex" pakotni, ko lieto transformers
+sys.path = [path for path in sys.path if os.path.abspath(path or ".") != ROOT] + [ROOT]
+
+import metrics
+
+### Parametri, kas tiek mainīti atkarībā no servera noslodzes
+HOST = "127.0.0.1"
+PORT = 8765
+MODEL_DIR = os.path.join(ROOT, "special_model") # Mape ar Pretrained.pth un parveidojums_N adapteriem
+NOTEBOOK_PATH = os.path.join(ROOT, "special_model", "transformer.ipynb")
+GOLD_DIR = os.path.join(ROOT, "special_model", "parveidojumi") # Slodzes ģeneratora lemmas
+MAX_BATCH = 64 # Maksimālais pieprasījumu skaits vienā apvienotajā izsaukumā
+MAX_WAIT = 0.005 # Laiks sekundēs, cik ilgi pēc pirmā pieprasījuma tiek gaidīti nākamie
+NUM_BEAMS = 5
+LATENCY_WINDOW = 10000 # Pēdējo pieprasījumu skaits, no kuriem tiek aprēķinātas latentuma kvantiles
+LOAD_CONCURRENCY = (1, 2, 4, 8, 16) # Slodzes ģeneratora vienlaicīgo klientu skaiti
+LOAD_REQUESTS = 200 # Pieprasījumu skaits katram vienlaicīguma līmenim
+###
+
+# Notebook šūnas (pēc metadatu id), kurās definēts tekstvienību apstrādātājs, modelis, beam search un MultiAdapterRuntime
+NOTEBOOK_CELLS = ("aapNR8jPZokq", "7zAzuo-6aZ5E", "kVGcNxIHfsaG", "k2VbQm8sHa1n")
+
+# Importi un slēdži, ko šīs šūnas sagaida no notebook pirmās šūnas
+NOTEBOOK_PRELUDE = """
+import os, sys, math, copy, time, random, threading, csv
+import numpy as np
+import torch, torch.nn as nn
+from collections import OrderedDict
+from transformers import PreTrainedTokenizer
+from peft import PeftModel
+from lexicon import Lexicon
+import metrics
+constrained_decoding = False
+lexicon_penalty = None
+"""
+
+# Izpilda notebook šūnas modeļa mapē (adapteri un bāzes modelis tiek ielādēti pēc relatīvajiem ceļiem) un atgriež to vārdu telpu
+def load_notebook():
+    with open(NOTEBOOK_PATH, "r", encoding="utf-8") as fin:
+        cells = {cell.get("metadata", {}).get("id"): "".join(cell["source"]) for cell in json.load(fin)["cells"]}
+    namespace = {"__name__": "transformer_notebook"}
+    exec(NOTEBOOK_PRELUDE, namespace)
+    for cell_id in NOTEBOOK_CELLS:
+        exec(compile(cells[cell_id], f"transformer.ipynb:{cell_id}", "exec"), namespace)
+    return namespace
+
+# Apvieno pieprasījumus, kas pienāk {max_wait} sekunžu laikā pēc pirmā (ne vairāk kā {max_batch}), vienā MultiAdapterRuntime.generate
+# izsaukumā, kas tos sagrupē pa adapteriem un katram adapterim veic vienu beam search. Modeli izmanto tikai viens pavediens.
+class MicroBatcher:
+    def __init__(self, runtime, max_batch=MAX_BATCH, max_wait=MAX_WAIT, num_beams=NUM_BEAMS, lexicon=None, lexicon_penalty=None):
+        self.runtime = runtime
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.generate_kwargs = dict(num_beams=num_beams, lexicon=lexicon, lexicon_penalty=lexicon_penalty)
+        self.stats = {"requests": 0, "batches": 0, "errors": 0}
+        self._latencies = deque(maxlen=LATENCY_WINDOW) # Laiks no pieprasījuma saņemšanas līdz rezultātam sekundēs
+        self._batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    # Ievieto pieprasījumu (lemma, semantiskā kategorija 1, semantiskā kategorija 2) rindā un atgriež Future ar kandidātu sarakstu
+    def submit(self, lemma, semantic_category_1, semantic_category_2):
+        future = Future()
+        self._queue.put(((lemma, semantic_category_1, semantic_category_2), future, time.perf_counter()))
+        return future
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    # Savāc nākamo partiju: bloķējoši gaida pirmo pieprasījumu, pēc tam līdz {max_wait} sekundēm nākamos
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch and batch[-1] is not None:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            batch = [item for item in batch if item is not None]
+            if batch:
+                self._process(batch)
+            if stop:
+                return
+
+    # Ja apvienotais izsaukums neizdodas, pieprasījumi tiek atkārtoti pa vienam, lai kļūdu saņemtu tikai kļūdainais pieprasījums
+    def _process(self, batch):
+        metrics.gauge("service/queue_depth", self._queue.qsize())
+        try:
+            with metrics.timer("service/batch"):
+                outputs = self.runtime.generate([request for request, _, _ in batch], **self.generate_kwargs)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return
+            metrics.count("service/batch_retries")
+            for item in batch:
+                self._process([item])
+            return
+
+        done = time.perf_counter()
+        for (_, future, enqueued), output in zip(batch, outputs):
+            future.set_result(output)
+            metrics.observe("service/latency", done - enqueued)
+        with self._lock:
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self._latencies.extend(done - enqueued for _, _, enqueued in batch)
+            self._batch_sizes.append(len(batch))
+
+    def _fail(self, item, error):
+        item[1].set_exception(error)
+        metrics.count("service/errors")
+        with self._lock:
+            self.stats["errors"] += 1
+
+    # Atgriež servisa rādītājus: rindas garums, pieprasījumu un partiju skaits, vidējais partijas izmērs un latentuma kvantiles (ms)
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            batch_sizes = list(self._batch_sizes)
+            stats = dict(self.stats)
+
+        def quantile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3) if latencies else None
+
+        return {
+            "queue_depth": self._queue.qsize(), **stats,
+            "mean_batch_size": round(sum(batch_sizes) / len(batch_sizes), 3) if batch_sizes else None,
+            "latency_ms": {"p50": quantile(0.5), "p90": quantile(0.9), "p99": quantile(0.99),
+                           "max": round(latencies[-1] * 1000, 3) if latencies else None, "window": len(latencies)},
+        }
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+# HTTP saskarne:
+#   POST /generate  {"lemma": ..., "semantic_category_1": ..., "semantic_category_2": ...} vai {"requests": [{...}, ...]}
+#                   -> {"candidates": [...]} vai {"results": [[...], ...]}; null, ja pārveidojumam nav adaptera
+#   GET  /metrics   -> MicroBatcher.snapshot()
+#   GET  /transformations -> [[semantiskā kategorija 1, semantiskā kategorija 2], ...] adapteru secībā
+#   GET  /health
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Klienti var izmantot vienu savienojumu vairākiem pieprasījumiem
+    batcher = None
+    transformations = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.send_json(200, self.batcher.snapshot())
+        elif self.path == "/transformations":
+            self.send_json(200, self.transformations)
+        elif self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": f"Nezināms ceļš: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self.send_json(404, {"error": f"Nezināms ceļš: {self.path}"})
+            return
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            single = isinstance(data, dict) and "requests" not in data
+            items = [data] if single else data["requests"]
+            requests = [(item["lemma"], item["semantic_category_1"], item["semantic_category_2"]) for item in items]
+            for request in requests:
+                if not all(isinstance(value, str) for value in request):
+                    raise TypeError(f"lemma un semantiskajām kategorijām jābūt virknēm: {request}")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"Nederīgs pieprasījums: {type(e).__name__}: {e}"})
+            return
+
+        futures = [self.batcher.submit(*request) for request in requests]
+        try:
+            results = [future.result() for future in futures]
+        except Exception as e:
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self.send_json(200, {"candidates": results[0]} if single else {"results": results})
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # Noklusētā rinda (5) pie daudziem vienlaicīgiem savienojumiem noraida klientus
+
+def stop(signum, frame):
+    raise KeyboardInterrupt
+
+# Ielādē bāzes modeli un visus adapterus vienreiz un darbina servisu līdz pārtraukšanai (Ctrl+C vai SIGTERM)
+def serve(host=HOST, port=PORT, model_dir=MODEL_DIR, max_batch=MAX_BATCH, max_wait=MAX_WAIT, num_beams=NUM_BEAMS,
+          lexicon_path=None, lexicon_penalty=None, threads=None):
+    cwd = os.getcwd()
+    os.chdir(model_dir)
+    try:
+        namespace = load_notebook()
+        if threads:
+            namespace["torch"].set_num_threads(threads)
+        runtime = namespace["MultiAdapterRuntime"]()
+    finally:
+        os.chdir(cwd)
+    lexicon = namespace["Lexicon"](lexicon_path) if lexicon_path else None
+
+    batcher = MicroBatcher(runtime, max_batch, max_wait, num_beams, lexicon, lexicon_penalty)
+    handler = type("Handler", (ServiceHandler,), {"batcher": batcher, "transformations": [list(t) for t in runtime.routes]})
+    server = ServiceServer((host, port), handler)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Serviss darbojas: http://{host}:{server.server_address[1]} ({len(runtime.routes)} adapteri, "
+          f"partija līdz {max_batch} pieprasījumiem, gaidīšana {max_wait * 1000:g} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+    print(f"Servisa rādītāji: {json.dumps(batcher.snapshot(), ensure_ascii=False)}")
+
+# Nolasa slodzes ģeneratora pieprasījumus: katra pārveidojuma parveidojums_N.csv lemmas ar servisa adapteru kategorijām
+def read_load_requests(transformations, gold_dir=GOLD_DIR):
+    requests = []
+    for n, (semantic_category_1, semantic_category_2) in enumerate(transformations, start=1):
+        path = os.path.join(gold_dir, f"parveidojums_{n}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", newline="", encoding="utf-8-sig") as fin:
+            reader = csv.reader(fin, delimiter=";")
+            next(reader, None) # Galvene
+            requests.extend((row[0], semantic_category_1, semantic_category_2) for row in reader if row)
+    return requests
+
+def http_json(connection, method, path, data=None):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8") if data is not None else None
+    connection.request(method, path, body=body, headers={"Content-Type": "application/json"} if body else {})
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    if response.status != 200:
+        raise RuntimeError(f"HTTP {response.status}: {payload.get('error')}")
+    return payload
+
+# Nosūta {total} pieprasījumus no {concurrency} vienlaicīgiem klientiem (katram savs savienojums) un atgriež caurlaidību,
+# klienta latentuma kvantiles un servera vidējo partijas izmēru šajā posmā
+def run_load(url, requests, concurrency, total):
+    parts = urlsplit(url)
+    connect = lambda: http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=300)
+    before = http_json(connect(), "GET", "/metrics")
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def client():
+        connection = connect()
+        for i in counter: # Kopīgs iterators sadala pieprasījumus starp klientiem
+            lemma, semantic_category_1, semantic_category_2 = requests[i % len(requests)]
+            start = time.perf_counter()
+            try:
+                http_json(connection, "POST", "/generate", {"lemma": lemma, "semantic_category_1": semantic_category_1,
+                                                            "semantic_category_2": semantic_category_2})
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                connection.close()
+                connection = connect()
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        connection.close()
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    after = http_json(connect(), "GET", "/metrics")
+    latencies.sort()
+    batches = after["batches"] - before["batches"]
+    quantile = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1) if latencies else None
+    return {
+        "concurrency": concurrency, "requests": len(latencies), "errors": len(errors),
+        "throughput": round(len(latencies) / elapsed, 2), "p50_ms": quantile(0.5), "p99_ms": quantile(0.99),
+        "mean_batch_size": round((after["requests"] - before["requests"]) / batches, 2) if batches else None,
+        "first_error": f"{type(errors[0]).__name__}: {errors[0]}" if errors else None,
+    }
+
+# Izmēra servisa caurlaidību ar pieaugošu vienlaicīgo klientu skaitu
+def load_test(url, concurrency_levels=LOAD_CONCURRENCY, total=LOAD_REQUESTS, gold_dir=GOLD_DIR):
+    parts = urlsplit(url)
+    transformations = http_json(http.client.HTTPConnection(parts.hostname, parts.port or 80), "GET", "/transformations")
+    requests = read_load_requests(transformations, gold_dir)
+    if not requests:
+        raise ValueError(f"Mapē {gold_dir} nav atrasta neviena parveidojums_N.csv datne")
+
+    run_load(url, requests, 1, min(total, 5)) # Iesildīšana
+    results = []
+    print("klienti\tpieprasījumi/s\tp50 ms\tp99 ms\tvid. partija\tkļūdas")
+    for concurrency in concurrency_levels:
+        result = run_load(url, requests, concurrency, total)
+        results.append(result)
+        print(f"{result['concurrency']}\t{result['throughput']}\t{result['p50_ms']}\t{result['p99_ms']}\t"
+              f"{result['mean_batch_size']}\t{result['errors']}")
+        if result["first_error"]:
+            print(f"  pirmā kļūda: {result['first_error']}")
+    return results
+
+def parse_levels(value):
+    return [int(level) for level in value.split(",") if level.strip()]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Specializētā modeļa inferences serviss ar dinamisku pieprasījumu apvienošanu")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("serve", help="Palaist servisu")
+    command.add_argument("--host", default=HOST)
+    command.add_argument("--port", type=int, default=PORT)
+    command.add_argument("--model-dir", default=MODEL_DIR)
+    command.add_argument("--max-batch", type=int, default=MAX_BATCH, help="1 - bez pieprasījumu apvienošanas")
+    command.add_argument("--max-wait", type=float, default=MAX_WAIT * 1000, help="Gaidīšanas logs milisekundēs")
+    command.add_argument("--num-beams", type=int, default=NUM_BEAMS)
+    command.add_argument("--lexicon", default=None, help="Leksikona datne ierobežotai dekodēšanai")
+    command.add_argument("--lexicon-penalty", type=float, default=None)
+    command.add_argument("--threads", type=int, default=None, help="torch pavedienu skaits")
+    command = commands.add_parser("load", help="Izmērīt darbojoša servisa caurlaidību")
+    command.add_argument("--url", default=f"http://{HOST}:{PORT}")
+    command.add_argument("--concurrency", type=parse_levels, default=list(LOAD_CONCURRENCY), help="1,2,4,8,16")
+    command.add_argument("--requests", type=int, default=LOAD_REQUESTS)
+    command.add_argument("--output", default=None, help="JSON datne rezultātiem")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.model_dir, args.max_batch, args.max_wait / 1000, args.num_beams,
+              args.lexicon, args.lexicon_penalty, args.threads)
+    else:
+        results = load_test(args.url, args.concurrency, args.requests)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as fout:
+                json.dump(results, fout, ensure_ascii=False, indent=2)
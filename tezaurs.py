@@ -0,0 +1,259 @@
+# Autors: Ronalds Turnis
+# Programma vienreiz nolasa Tēzaura semantisko attiecību pārus lokālā indeksētā SQLite momentuzņēmumā, no kura ātri iegūst pārveidojumu skaitus, piemērus un apmācības pārus
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import sqlite3
+import argparse
+from rule_scoring import GOLD_CATEGORIES
+
+### Parametri, kas tiek mainīti atkarībā no Tēzaura datubāzes
+SOURCE = os.environ.get("TEZAURS_DSN", "") # PostgreSQL savienojuma virkne vai lokālas SQLite datubāzes (piemēram, testa datu) ceļš
+SNAPSHOT_PATH = "tezaurs_snapshot.sqlite"
+FETCH_SIZE = 10000 # No avota vienā reizē nolasīto rindu skaits
+TOP_N = 10 # Piemēriem visbagātāko pārveidojumu skaits (tāpat kā SQL.sql)
+SAMPLE_SIZE = 5 # Piemēru skaits katram pārveidojumam
+GOLD_DIR = os.path.join("special_model", "parveidojumi")
+###
+
+# Tas pats piecu tabulu savienojums kā SQL.sql, bet vienā vaicājumā atlasa visus (role_1, role_2, heading, heading2) pārus
+# un to attiecību skaitu. Operators ->> darbojas gan PostgreSQL jsonb, gan SQLite (>= 3.38) JSON teksta laukiem.
+SNAPSHOT_QUERY = """
+SELECT sr.data ->> 'role_1' AS role_1, sr.data ->> 'role_2' AS role_2, e1.heading, e2.heading AS heading2, COUNT(*) AS relations
+FROM dict.sense_relations sr
+JOIN dict.senses s1 ON s1.id = sr.sense_1_id
+JOIN dict.senses s2 ON s2.id = sr.sense_2_id
+JOIN dict.entries e1 ON e1.id = s1.entry_id
+JOIN dict.entries e2 ON e2.id = s2.entry_id
+WHERE sr.data IS NOT NULL AND sr.data ->> 'role_1' IS NOT NULL AND sr.data ->> 'role_2' IS NOT NULL
+GROUP BY 1, 2, 3, 4
+"""
+
+# Momentuzņēmuma shēma: pāri glabājas primārās atslēgas secībā, tāpēc viena pārveidojuma pāri ir blakus un tiek nolasīti
+# ar vienu indeksa diapazonu. Pārveidojumu tabula ir maza un tiek ielādēta atmiņā, tāpēc skaitu iegūšana ir O(1).
+SCHEMA = (
+    "CREATE TABLE pairs ("
+    "role_1 TEXT NOT NULL, role_2 TEXT NOT NULL, heading TEXT NOT NULL, heading2 TEXT NOT NULL, relations INTEGER NOT NULL, "
+    "PRIMARY KEY (role_1, role_2, heading, heading2)) WITHOUT ROWID",
+    "CREATE TABLE transformations ("
+    "role_1 TEXT NOT NULL, role_2 TEXT NOT NULL, relations INTEGER NOT NULL, pairs INTEGER NOT NULL, "
+    "PRIMARY KEY (role_1, role_2)) WITHOUT ROWID",
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+# Testa datubāzes shēma ar tām pašām dict.* tabulām un kolonnām, ko izmanto SNAPSHOT_QUERY
+FIXTURE_SCHEMA = (
+    "CREATE TABLE entries (id INTEGER PRIMARY KEY, heading TEXT NOT NULL)",
+    "CREATE TABLE senses (id INTEGER PRIMARY KEY, entry_id INTEGER NOT NULL REFERENCES entries(id))",
+    "CREATE TABLE sense_relations (id INTEGER PRIMARY KEY, sense_1_id INTEGER NOT NULL, sense_2_id INTEGER NOT NULL, data TEXT)",
+)
+
+# Atver avota datubāzi. SQLite datne tiek pievienota ar shēmas nosaukumu "dict", lai vaicājums būtu tāds pats kā PostgreSQL.
+def connect_source(source):
+    if os.path.exists(source):
+        conn = sqlite3.connect(":memory:", uri=True)
+        conn.execute("ATTACH DATABASE ? AS dict", (f"file:{os.path.abspath(source)}?mode=ro",))
+        return conn
+    try:
+        import psycopg
+    except ImportError:
+        try:
+            import psycopg2 as psycopg
+        except ImportError:
+            raise ImportError("Savienojumam ar PostgreSQL nepieciešama pakotne psycopg (pip install psycopg)") from None
+    return psycopg.connect(source)
+
+# Nolasa avota rindas pa daļām. PostgreSQL izmanto servera puses kursoru, lai viss rezultāts netiktu ielādēts atmiņā.
+def read_source(conn):
+    cursor = conn.cursor() if isinstance(conn, sqlite3.Connection) else conn.cursor(name="tezaurs_snapshot")
+    cursor.execute(SNAPSHOT_QUERY)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+    cursor.close()
+
+# Izveido momentuzņēmumu no avota datubāzes. Datne tiek rakstīta .partial datnē un aizstāta tikai pēc veiksmīgas nolasīšanas.
+def build_snapshot(source=SOURCE, path=SNAPSHOT_PATH):
+    if not source:
+        raise ValueError("Nav norādīts Tēzaura avots (TEZAURS_DSN vai komandrindas arguments)")
+    tmp = path + ".partial"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    start = time.time()
+    src = connect_source(source)
+    out = sqlite3.connect(tmp)
+    try:
+        for statement in SCHEMA:
+            out.execute(statement)
+        out.executemany("INSERT INTO pairs VALUES (?, ?, ?, ?, ?)", read_source(src))
+        out.execute("INSERT INTO transformations SELECT role_1, role_2, SUM(relations), COUNT(*) FROM pairs GROUP BY role_1, role_2")
+        source_name = os.path.abspath(source) if os.path.exists(source) else "postgresql" # Savienojuma virknē var būt parole
+        out.executemany("INSERT INTO meta VALUES (?, ?)", [("source", source_name), ("created_at", time.strftime("%Y-%m-%dT%H:%M:%S"))])
+        out.commit()
+        pairs, transformations = out.execute("SELECT SUM(pairs), COUNT(*) FROM transformations").fetchone()
+    finally:
+        out.close()
+        src.close()
+    os.replace(tmp, path)
+    print(f"Momentuzņēmums ar {pairs or 0} pāriem un {transformations} pārveidojumiem saglabāts datnē: {path} ({time.time() - start:.1f} s)")
+    return path
+
+# Izveido nelielu testa datubāzi ar dict.* tabulām no (role_1, role_2, heading, heading2) ierakstiem.
+# Katrs ieraksts kļūst par vienu nozīmju attiecību, tāpēc atkārtoti ieraksti palielina pāra attiecību skaitu.
+def write_fixture(path, relations):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    for statement in FIXTURE_SCHEMA:
+        conn.execute(statement)
+    senses = {}
+    def sense_id(heading):
+        if heading not in senses:
+            senses[heading] = len(senses) + 1
+            conn.execute("INSERT INTO entries VALUES (?, ?)", (senses[heading], heading))
+            conn.execute("INSERT INTO senses VALUES (?, ?)", (senses[heading], senses[heading]))
+        return senses[heading]
+    for role_1, role_2, heading, heading2 in relations:
+        data = None if role_1 is None and role_2 is None else json.dumps({"role_1": role_1, "role_2": role_2}, ensure_ascii=False)
+        conn.execute("INSERT INTO sense_relations (sense_1_id, sense_2_id, data) VALUES (?, ?, ?)",
+                     (sense_id(heading), sense_id(heading2), data))
+    conn.commit()
+    conn.close()
+    return path
+
+# Nolasa zelta standarta parveidojums_N.csv pārus kā testa datubāzes ierakstus
+def read_gold_relations(gold_dir=GOLD_DIR):
+    relations = []
+    for n, (role_1, role_2) in enumerate(GOLD_CATEGORIES, start=1):
+        path = os.path.join(gold_dir, f"parveidojums_{n}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", newline="", encoding="utf-8-sig") as fin:
+            reader = csv.reader(fin, delimiter=";")
+            next(reader, None) # Galvene
+            relations.extend((role_1, role_2, row[0], row[1]) for row in reader if len(row) >= 2)
+    return relations
+
+class TezaursSnapshot:
+    def __init__(self, path=SNAPSHOT_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Momentuzņēmums nav atrasts: {path} (izveido ar: python tezaurs.py snapshot <avots>)")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self._counts = {(role_1, role_2): (relations, pairs)
+                        for role_1, role_2, relations, pairs in self._conn.execute("SELECT * FROM transformations")}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self._conn.close()
+
+    # Atgriež pārveidojumu sarakstu formātā (role_1, role_2, attiecību skaits, unikālo pāru skaits), sakārtotu pēc attiecību skaita
+    def transformations(self, limit=None):
+        ranked = sorted(((role_1, role_2, relations, pairs) for (role_1, role_2), (relations, pairs) in self._counts.items()),
+                        key=lambda t: (-t[2], t[0], t[1]))
+        return ranked[:limit] if limit else ranked
+
+    # Pārveidojuma unikālo (heading, heading2) pāru skaits vai, ja relations=True, nozīmju attiecību skaits (kā SQL.sql COUNT(*))
+    def count(self, role_1, role_2, relations=False):
+        counts = self._counts.get((role_1, role_2))
+        if counts is None:
+            return 0
+        return counts[0] if relations else counts[1]
+
+    # Atgriež visus pārveidojuma (heading, heading2) pārus indeksa secībā
+    def pairs(self, role_1, role_2):
+        return self._conn.execute(
+            "SELECT heading, heading2 FROM pairs WHERE role_1 = ? AND role_2 = ? ORDER BY heading, heading2", (role_1, role_2))
+
+    # Izvēlas k nejaušus pārus ar rezervuāra izlasi vienā indeksa diapazona nolasīšanā (bez ORDER BY random() kārtošanas).
+    # Ar vienādu seed un momentuzņēmumu izlase vienmēr ir vienāda.
+    def sample(self, role_1, role_2, k=SAMPLE_SIZE, seed=None):
+        rng = random.Random(seed)
+        reservoir = []
+        for i, pair in enumerate(self.pairs(role_1, role_2)):
+            if i < k:
+                reservoir.append(pair)
+            else:
+                j = rng.randrange(i + 1)
+                if j < k:
+                    reservoir[j] = pair
+        return reservoir
+
+    # Atgriež piemērus POSSIBLE_TRANSFORMATIONS formātā: [(role_1, role_2, {(heading, heading2), ...}), ...]
+    def examples(self, limit=TOP_N, k=SAMPLE_SIZE, seed=None):
+        return [(role_1, role_2, set(self.sample(role_1, role_2, k, seed)))
+                for role_1, role_2, _, _ in self.transformations(limit)]
+
+    # Ieraksta visus pārveidojuma pārus parveidojumi/*.csv formātā (Lemma;Word, UTF-8 ar BOM) un atgriež pāru skaitu
+    def export_pairs(self, role_1, role_2, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".partial"
+        n = 0
+        with open(tmp, "w", newline="", encoding="utf-8-sig") as fout:
+            writer = csv.writer(fout, delimiter=";", lineterminator="\n")
+            writer.writerow(["Lemma", "Word"])
+            for pair in self.pairs(role_1, role_2):
+                writer.writerow(pair)
+                n += 1
+        os.replace(tmp, path)
+        return n
+
+    # Ieraksta zelta standarta kategoriju pārus datnēs parveidojums_N.csv (tādā pašā secībā kā GOLD_CATEGORIES)
+    def export_gold(self, output_dir=GOLD_DIR, categories=GOLD_CATEGORIES):
+        for n, (role_1, role_2) in enumerate(categories, start=1):
+            path = os.path.join(output_dir, f"parveidojums_{n}.csv")
+            print(f"{role_1} -> {role_2}: {self.export_pairs(role_1, role_2, path)} pāri saglabāti datnē: {path}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tēzaura semantisko attiecību momentuzņēmums")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="Momentuzņēmuma datne")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("snapshot", help="Nolasīt pārus no Tēzaura datubāzes")
+    command.add_argument("source", nargs="?", default=SOURCE, help="PostgreSQL savienojuma virkne vai SQLite datne")
+    command = commands.add_parser("fixture", help="Izveidot testa datubāzi no zelta standarta pāriem")
+    command.add_argument("path")
+    command.add_argument("--gold-dir", default=GOLD_DIR)
+    command = commands.add_parser("top", help="Izdrukāt piemēriem visbagātākos pārveidojumus")
+    command.add_argument("limit", nargs="?", type=int, default=TOP_N)
+    command = commands.add_parser("sample", help="Izdrukāt nejaušus piemērus POSSIBLE_TRANSFORMATIONS formātā")
+    command.add_argument("--limit", type=int, default=TOP_N)
+    command.add_argument("-k", type=int, default=SAMPLE_SIZE)
+    command.add_argument("--seed", type=int, default=None)
+    command = commands.add_parser("export", help="Saglabāt zelta standarta kategoriju pārus parveidojums_N.csv datnēs")
+    command.add_argument("output_dir", nargs="?", default=GOLD_DIR)
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        try:
+            build_snapshot(args.source, args.snapshot)
+        except (ValueError, ImportError) as e:
+            sys.exit(str(e))
+    elif args.command == "fixture":
+        relations = read_gold_relations(args.gold_dir)
+        write_fixture(args.path, relations)
+        print(f"Testa datubāze ar {len(relations)} attiecībām saglabāta datnē: {args.path}")
+    else:
+        with TezaursSnapshot(args.snapshot) as snapshot:
+            if args.command == "top":
+                for role_1, role_2, relations, pairs in snapshot.transformations(args.limit):
+                    print(f"{role_1}\t{role_2}\t{relations}\t{pairs}")
+            elif args.command == "sample":
+                print("POSSIBLE_TRANSFORMATIONS = [")
+                for role_1, role_2, examples in snapshot.examples(args.limit, args.k, args.seed):
+                    print(f"    ({role_1!r}, {role_2!r}, {{{', '.join(map(repr, sorted(examples)))}}}),")
+                print("]")
+            elif args.command == "export":
+                snapshot.export_gold(args.output_dir)
@@ -0,0 +1,282 @@
+# Autors: Ronalds Turnis
+# Kopīgs kandidātu validācijas modulis, kas pārbauda vārda biežumu korpusā un saglabā rezultātus pastāvīgā kešatmiņā
+
+import os
+import time
+import sqlite3
+import threading
+import random
+import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from frequency_index import FrequencyIndex
+import metrics
+
+### Validācijas parametri
+# Korpuss, pret kuru tiek validēti kandidāti (NoSketch corpname). Ja izmanto FREQUENCY_INDEX, tam jāsakrīt ar indeksa korpusu
+# (frequency_index.py, pēc noklusējuma LVK2022), piemēram, VALIDATION_CORPUS=LVK2022, citādi validācija notiek ar korpusa API.
+CORPUS = os.environ.get("VALIDATION_CORPUS", "CommonCrawl")
+CACHE_PATH = os.environ.get("VALIDATION_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "validation_cache.sqlite"))
+CACHE_TTL = 30 * 24 * 3600 # Sastopamo vārdu (M/T) derīguma laiks kešatmiņā sekundēs, None - bez termiņa
+NEGATIVE_TTL = 7 * 24 * 3600 # Nesastopamo vārdu (F) derīguma laiks kešatmiņā sekundēs, 0 - F netiek kešoti
+NOSKETCH_URL = "https://nosketch.korpuss.lv/bonito/run.cgi/view" # Korpusa API adrese (testiem var norādīt lokālu serveri)
+CONCURRENCY = 8 # Vienlaicīgo pieprasījumu skaits
+RATE_LIMIT = 5.0 # Maksimālais pieprasījumu skaits sekundē
+RATE_BURST = 5 # Pieprasījumu skaits, ko drīkst nosūtīt uzreiz
+MAX_RETRIES = 3 # Atkārtojumu skaits pārejošu kļūdu gadījumā
+BACKOFF = 0.5 # Sākotnējā gaidīšana sekundēs pirms atkārtojuma, katru reizi dubultojas
+TIMEOUT = 10 # Viena pieprasījuma noildze sekundēs
+OFFLINE_INDEX = os.environ.get("FREQUENCY_INDEX") # frequency_index.py izveidotais indekss; ja norādīts, tā korpusa validācija notiek bez tīkla
+###
+
+# Pārvērš korpusa biežumu kandidāta tipā
+def classify_frequency(freq):
+    if freq == 0:
+        return "F" # nav sastopams
+    elif 1 <= freq <= 5:
+        return "M" # maz sastopams - nepieciešama manuāla pārbaude
+    return "T" # daudz sastopams
+
+# Izveido korpusa API pieprasījuma adresi, kas meklē vārdu gan kā vārdformu, gan kā lemmu
+def corpus_query_url(word, corpname=None):
+    corpname = corpname or CORPUS
+    encoded_word = urllib.parse.quote(word)
+    return (f"{NOSKETCH_URL}?"
+            f"corpname={corpname}&format=json&pagesize=2&fromp=0&attrs=word&"
+            "ctxattrs=word%2Ctag&kwicleftctx=5%23&kwicrightctx=5%23&async=0&"
+            f"q=q[lc%3D%22{encoded_word}%22+|+lemma_lc%3D%22{encoded_word}%22]")
+
+# Pastāvīga kešatmiņa korpusa biežumiem, kur atslēga ir (vārds mazajiem burtiem, korpuss)
+class ValidationCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "stores": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS frequencies ("
+            "word TEXT NOT NULL, corpus TEXT NOT NULL, freq INTEGER NOT NULL, checked_at REAL NOT NULL, "
+            "PRIMARY KEY (word, corpus))"
+        )
+        self._conn.commit()
+
+    # Atgriež (tips, biežums) vai None, ja ieraksta nav vai tas ir novecojis
+    def get(self, word, corpname=None):
+        corpname = corpname or CORPUS
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT freq, checked_at FROM frequencies WHERE word = ? AND corpus = ?", (word.lower(), corpname)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            freq, checked_at = row
+            ttl = self.negative_ttl if freq == 0 else self.ttl
+            if ttl is not None and time.time() - checked_at > ttl:
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self.stats["hits"] += 1
+            if freq == 0:
+                self.stats["negative_hits"] += 1
+            return classify_frequency(freq), freq
+
+    # Saglabā korpusa biežumu, F rezultātus tikai tad, ja ir atļauta negatīvā kešošana
+    def put(self, word, freq, corpname=None):
+        corpname = corpname or CORPUS
+        if freq == 0 and not self.negative_ttl:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO frequencies (word, corpus, freq, checked_at) VALUES (?, ?, ?, ?)",
+                (word.lower(), corpname, int(freq), time.time())
+            )
+            self._conn.commit()
+            self.stats["stores"] += 1
+
+    # Izdzēš visus novecojušos ierakstus
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            if self.ttl is not None:
+                self._conn.execute("DELETE FROM frequencies WHERE freq > 0 AND checked_at < ?", (now - self.ttl,))
+            if self.negative_ttl is not None:
+                self._conn.execute("DELETE FROM frequencies WHERE freq = 0 AND checked_at < ?", (now - self.negative_ttl,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache = None
+
+# Atgriež kopīgo kešatmiņas instanci, to izveidojot pirmajā izsaukumā
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ValidationCache()
+    return _cache
+
+# Ļauj mainīt kešatmiņas atrašanās vietu un derīguma laikus, vai to atslēgt (path=None)
+def configure_cache(path=CACHE_PATH, ttl=CACHE_TTL, negative_ttl=NEGATIVE_TTL):
+    global _cache
+    if _cache:
+        _cache.close()
+    _cache = ValidationCache(path, ttl, negative_ttl) if path else False
+
+_offline_index = None
+
+# Atgriež bezsaistes biežumu indeksu, ja tas ir norādīts
+def get_offline_index():
+    global _offline_index
+    if _offline_index is None and OFFLINE_INDEX:
+        _offline_index = FrequencyIndex(OFFLINE_INDEX)
+    return _offline_index
+
+# Atgriež bezsaistes indeksu tikai tad, ja tas izveidots no pieprasītā korpusa; citādi validācija notiek ar korpusa API
+def offline_index_for(corpname=None):
+    corpname = corpname or CORPUS
+    index = get_offline_index()
+    if index is None:
+        return None
+    if index.corpname != corpname:
+        metrics.count("validation/offline_corpus_mismatch")
+        return None
+    return index
+
+# Pārslēdz validāciju uz bezsaistes biežumu indeksu vai atpakaļ uz korpusa API (path=None)
+def use_offline_index(path):
+    global OFFLINE_INDEX, _offline_index
+    if _offline_index is not None:
+        _offline_index.close()
+    OFFLINE_INDEX, _offline_index = path, None
+
+# Žetonu spaiņa ātruma ierobežotājs, lai nepārslogotu korpusa serveri
+class TokenBucket:
+    def __init__(self, rate=RATE_LIMIT, capacity=RATE_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Gaida, līdz ir pieejams žetons, un to patērē
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_session = None
+_bucket = None
+_session_lock = threading.Lock()
+
+# Atgriež kopīgo HTTP sesiju ar savienojumu kopu un ātruma ierobežotāju
+def get_session():
+    global _session, _bucket
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CONCURRENCY)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _bucket = TokenBucket(RATE_LIMIT, RATE_BURST)
+    return _session, _bucket
+
+# Atiestata sesiju, piemēram, pēc CONCURRENCY vai RATE_LIMIT maiņas
+def reset_session():
+    global _session, _bucket
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session, _bucket = None, None
+
+# Veic pieprasījumu korpusa API un atgriež biežumu vai None kļūdas gadījumā
+def query_corpus(word, corpname=None):
+    corpname = corpname or CORPUS
+    session, bucket = get_session()
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+        try:
+            with metrics.timer("validation/http_latency"):
+                r = session.get(corpus_query_url(word, corpname), timeout=TIMEOUT)
+            if r.status_code == 200:
+                return r.json().get("fullsize", 0)
+            # Atkārto tikai pārejošas kļūdas (pārslodze vai servera kļūda)
+            if r.status_code != 429 and r.status_code < 500:
+                metrics.count("validation/errors")
+                return None
+            error = f"HTTP {r.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except Exception as e:
+            metrics.count("validation/errors")
+            print(f"Validācijas kļūda vārdam '{word}': {e}")
+            return None
+
+        if attempt < MAX_RETRIES:
+            metrics.count("validation/http_retries")
+            time.sleep(BACKOFF * 2 ** attempt * (1 + random.random() / 2))
+    metrics.count("validation/errors")
+    print(f"Validācijas kļūda vārdam '{word}': {error}")
+    return None
+
+# Funkcija, kas validē kandidātu, vispirms meklējot to kešatmiņā un tikai tad izmantojot korpusa API
+def validate_word(word, corpname=None):
+    corpname = corpname or CORPUS
+    word = word.lower()
+
+    # Bezsaistes indekss aizstāj gan kešatmiņu, gan korpusa API, ja tas izveidots no tā paša korpusa
+    index = offline_index_for(corpname)
+    if index is not None:
+        metrics.count("validation/offline_lookups")
+        freq = index.frequency(word)
+        return classify_frequency(freq), freq
+
+    cache = get_cache()
+    if cache:
+        cached = cache.get(word, corpname)
+        metrics.count("validation/cache_hits" if cached is not None else "validation/cache_misses")
+        if cached is not None:
+            return cached
+
+    freq = query_corpus(word, corpname)
+    if freq is None:
+        return "validation_error", None # Kļūdas netiek kešotas, lai nākamajā reizē mēģinātu vēlreiz
+
+    if cache:
+        cache.put(word, freq, corpname)
+    return classify_frequency(freq), freq
+
+# Validē vairākus kandidātus paralēli un atgriež rezultātus tādā pašā secībā kā ievadē
+def validate_words(words, corpname=None):
+    corpname = corpname or CORPUS
+    words = list(words)
+    unique = list(dict.fromkeys(w.lower() for w in words)) # Katrs vārds tiek pārbaudīts tikai vienreiz
+    if not unique:
+        return []
+
+    # Bezsaistes indeksam tīkla pavedieni nav nepieciešami
+    if offline_index_for(corpname) is not None:
+        return [validate_word(w, corpname) for w in words]
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        found = dict(zip(unique, pool.map(lambda w: validate_word(w, corpname), unique)))
+    return [found[w.lower()] for w in words]
+
+# Atgriež kešatmiņas trāpījumu un netrāpījumu statistiku
+def cache_stats():
+    cache = get_cache()
+    return dict(cache.stats) if cache else {}